@@ -8,6 +8,29 @@ version="0.12.13"
 
 
 from argparse import ArgumentParser
+import ast
+import bisect
+import bz2
+from collections import Counter
+import datetime
+import gzip
+import hashlib
+import heapq
+import itertools
+import json
+import lzma
+import math
+import mmap
+import multiprocessing
+import queue
+import re
+import resource
+import shutil
+import stat
+import sys
+import threading
+import time
+import unicodedata
 import numpy as np
 try:
     import os
@@ -20,59 +43,280 @@ except:
 ### Argument parsing and initialization
 
 
-parser= ArgumentParser()
+# Stdlib compression codecs: module, magic bytes, file extension, compression level arguments
+codecs= {"gzip": (gzip, b"\x1f\x8b", ".gz", {"compresslevel": 6}), 
+         "bz2": (bz2, b"BZh", ".bz2", {"compresslevel": 9}), 
+         "xz": (lzma, b"\xfd7zXZ\x00", ".xz", {"preset": 6})}
 
-parser.add_argument("-w", "--workdir", dest="workdir", default="/tmp")
-parser.add_argument("-i", "--interactive-mode", dest="mode_interactive", default=False)
-parser.add_argument("--pval", dest="pval", default="0.50")
-parser.add_argument("--pval-cpatt", dest="pval_cpatt", default="")
-parser.add_argument("--pval-let", dest="pval_let", default="")
-parser.add_argument("--pval-num", dest="pval_num", default="")
-parser.add_argument("--pval-spec", dest="pval_spec", default="")
-parser.add_argument("inpwfile", type= str)
-parser.add_argument("outpwfile", type= str)
+# Analysis cache: number of kept analyses
+cachekeep= 8
 
-parser.description="pwanalygen.py is a pw word list sec tool, that includes a sophisticated, data-science based word list analyzer and a compatible word list generator, which also builds the new frequency efficient word list following the analyzed pw construction patterns as a proof-of-concept implementation."
+# Seconds between two checkpoints of the generation
+checkpointinterval= 60
 
-parser.epilog="The program can create A LOT OF NEW PWs based on the analyzed pw construction patterns in the original <inpwfile>. It can 'pump up' the original <inpwfile> by magnitudes in size, from e.g. 50k pws to e.g. 1M pws, or even more. The data-science and word list based pw break approach is performed in three main steps. In the first step the original pws are split into substrings of lettter symbols, substrings of number symbols and substrings of special symbols. E.g. the pw 'love1982!' gets splitted into 'love', '1982' and '!'. Each original pw also gets transformed into a pw construction pattern, in the example to 'AAAA1111$', which subsequently gets further aggregated to the condensed pw construction pattern 'A1$'. (To be interpreted as: A series of letters followed by a series of numbers followed by a series of special characters.) In the second step the relative cumulated frequencies of the let-, num-, and special-substrings are computed; also the relative cumulated frequencies of the condensed pw construction patterns. Their high-frequency outcomes below or at the critical p-value get selected; the remaining lower frequency outcomes are cut off (p-value=0.0 --> select 0% of the outcomes; p-value=1.0 --> select 100% of the outcomes). In the third step the selected pw element outcomes get combined straight following the selected condensed pw construction patterns (called 'cpattprod' inside the program). The final size of the generated <outpwfile> is steered by the specified p-value. A high p-value creates a more large pw list, a low p-value creates a (more) small one (pw list compression functionality at very low p-values). The more close the p-value gets to 1.0, the more >> over-linear will the generated <outpwfile> increase.<< As far the <inpwfile> is not trivial simple structured, high p-vales at some point will undenyably result in a 'never' ending pw generation job. Thus, it is highly recommended to start with moderate p-values first (e.g. 0.5) and to switch to interactive mode for higher p-values, in order to find individual p-values by category, that match the trade-off between the covered pw element outcome proportion versus the maximum acceptable generation job time/ maximum generated file size at best. Therefor view the printouts of the relative cumulated frequencies of every pw element category. Finally, sec officers and sysadmins can use the generated <outpwfile> to perform a simulated pw try-out on another unknown pw list, in order to derive a rough estimate of the own pws at risk proportion. However, the major information gain of the tool is the deep insight, how pws are structured and how relatively short pws can be assembled, that none the less are pretty safe. If there is interest in this direction, further complementary tools for  -Cleansing disturbing characters 'cleansetxtfile.py'  -Random sampling mega large (rockyou.txt) pw files 'samplefile.py'  - Simulated pw try-out 'f1prop-in-f2.py' - can be offered. Requirements: - Python3 (or higher) - numpy"         
+# Estimated memory of a pw in the exact dedup set, in addition to its length (bytes object and set slot)
+setentrybytes= 90
 
-args= parser.parse_args()
+# Substring categories of the analysis
+categories= ("cpatt", "let", "num", "spec")
+# Condensed pw pattern symbols of the substring categories
+categorysymbols= {"let": ord("A"), "num": ord("1"), "spec": ord("$")}
+symbolcategories= {ord("A"): "let", ord("1"): "num", ord("$"): "spec"}
+# In-memory sorted substring counts and relative cumulated frequencies by category of step [1]
+tokenstats= {}
+# In-memory selected substrings by category of the steps [2a] - [2d]
+tokenprod= {}
+# Instrumentation: the running stage and the statistics of the finished stages
+progress= None
+stagestats= {}
 
-mode_interactive= bool(args.mode_interactive)
-pval= args.pval
-pval_cpatt= args.pval_cpatt
-pval_let= args.pval_let
-pval_num= args.pval_num
-pval_spec= args.pval_spec
 
-if pval_cpatt == "":
-    pval_cpatt= pval 
-if pval_let == "":
-    pval_let= pval
-if pval_num == "":
-    pval_num= pval
-if pval_spec == "":
-    pval_spec= pval 
 
-pval= float(pval)
-pval_cpatt= float(pval_cpatt)
-pval_let= float(pval_let)
-pval_num= float(pval_num)
-pval_spec= float(pval_spec)
+def build_parser():
 
-workdir= args.workdir
-ifl= args.inpwfile
-ofl= args.outpwfile
+    """
+    Returning the argument parser of the command line interface.
+    """
+
+    parser= ArgumentParser()
+
+    parser.add_argument("-w", "--workdir", dest="workdir", default="/tmp")
+    parser.add_argument("-i", "--interactive-mode", dest="mode_interactive", default=False)
+    parser.add_argument("-j", "--jobs", dest="jobs", default="1")
+    parser.add_argument("--write-dic", dest="write_dic", action="store_true")
+    parser.add_argument("--no-cache", dest="no_cache", action="store_true")
+    parser.add_argument("--update", dest="update", action="store_true")
+    parser.add_argument("--utf8", dest="utf8", action="store_true")
+    parser.add_argument("--gen-jobs", dest="gen_jobs", default="1")
+    parser.add_argument("--compress", dest="compress", choices=("none", "gzip", "bz2", "xz"), default="")
+    parser.add_argument("--slots", dest="slots", choices=("independent", "shared"), default="independent")
+    parser.add_argument("--order", dest="order", choices=("pattern", "probability"), default="pattern")
+    parser.add_argument("--top", dest="top", default="")
+    parser.add_argument("--max-candidates", dest="max_candidates", default="")
+    parser.add_argument("--max-bytes", dest="max_bytes", default="")
+    parser.add_argument("--start", dest="start", default="0")
+    parser.add_argument("--count", dest="count", default="")
+    parser.add_argument("--shard", dest="shard", default="")
+    parser.add_argument("--checkpoint", dest="checkpoint", default="")
+    parser.add_argument("--resume", dest="resume", action="store_true")
+    parser.add_argument("--sample", dest="sample", default="")
+    parser.add_argument("--sample-mode", dest="sample_mode", choices=("uniform", "weighted"), default="uniform")
+    parser.add_argument("--seed", dest="seed", default="")
+    parser.add_argument("--dedup", dest="dedup", action="store_true")
+    parser.add_argument("--exclude-input", dest="exclude_input", action="store_true")
+    parser.add_argument("--dedup-memory", dest="dedup_memory", default="1024")
+    parser.add_argument("--dedup-fpr", dest="dedup_fpr", default="0.001")
+    parser.add_argument("--pval", dest="pval", default="0.50")
+    parser.add_argument("--pval-cpatt", dest="pval_cpatt", default="")
+    parser.add_argument("--pval-let", dest="pval_let", default="")
+    parser.add_argument("--pval-num", dest="pval_num", default="")
+    parser.add_argument("--pval-spec", dest="pval_spec", default="")
+    parser.add_argument("--weights", dest="weights", default="")
+    parser.add_argument("--write-store", dest="write_store", default="")
+    parser.add_argument("--progress", dest="progress", default="10")
+    parser.add_argument("--stats-json", dest="stats_json", default="")
+    parser.add_argument("--evaluate", dest="evaluate", default="")
+    parser.add_argument("inpwfile", type= str, nargs="+")
+    parser.add_argument("outpwfile", type= str)
+
+    parser.description="pwanalygen.py is a pw word list sec tool, that includes a sophisticated, data-science based word list analyzer and a compatible word list generator, which also builds the new frequency efficient word list following the analyzed pw construction patterns as a proof-of-concept implementation."
+
+    parser.epilog="The program can create A LOT OF NEW PWs based on the analyzed pw construction patterns in the original <inpwfile>. It can 'pump up' the original <inpwfile> by magnitudes in size, from e.g. 50k pws to e.g. 1M pws, or even more. The data-science and word list based pw break approach is performed in three main steps. In the first step the original pws are split into substrings of lettter symbols, substrings of number symbols and substrings of special symbols. E.g. the pw 'love1982!' gets splitted into 'love', '1982' and '!'. Each original pw also gets transformed into a pw construction pattern, in the example to 'AAAA1111$', which subsequently gets further aggregated to the condensed pw construction pattern 'A1$'. (To be interpreted as: A series of letters followed by a series of numbers followed by a series of special characters.) In the second step the relative cumulated frequencies of the let-, num-, and special-substrings are computed; also the relative cumulated frequencies of the condensed pw construction patterns. Their high-frequency outcomes below or at the critical p-value get selected; the remaining lower frequency outcomes are cut off (p-value=0.0 --> select 0% of the outcomes; p-value=1.0 --> select 100% of the outcomes). In the third step the selected pw element outcomes get combined straight following the selected condensed pw construction patterns (called 'cpattprod' inside the program). The final size of the generated <outpwfile> is steered by the specified p-value. A high p-value creates a more large pw list, a low p-value creates a (more) small one (pw list compression functionality at very low p-values). The more close the p-value gets to 1.0, the more >> over-linear will the generated <outpwfile> increase.<< As far the <inpwfile> is not trivial simple structured, high p-vales at some point will undenyably result in a 'never' ending pw generation job. Thus, it is highly recommended to start with moderate p-values first (e.g. 0.5) and to switch to interactive mode for higher p-values, in order to find individual p-values by category, that match the trade-off between the covered pw element outcome proportion versus the maximum acceptable generation job time/ maximum generated file size at best. Therefor view the printouts of the relative cumulated frequencies of every pw element category. Finally, sec officers and sysadmins can use the generated <outpwfile> to perform a simulated pw try-out on another unknown pw list, in order to derive a rough estimate of the own pws at risk proportion. However, the major information gain of the tool is the deep insight, how pws are structured and how relatively short pws can be assembled, that none the less are pretty safe. If there is interest in this direction, further complementary tools for  -Cleansing disturbing characters 'cleansetxtfile.py'  -Random sampling mega large (rockyou.txt) pw files 'samplefile.py'  - Simulated pw try-out 'f1prop-in-f2.py' - can be offered. Requirements: - Python3 (or higher) - numpy"
+    
+    return parser
+
+
+
+def configure(args):
+
+    """
+    Initializing the module state, the options, the workfile paths and the mode dependent tables, 
+    from the options namespace args of the command line interface (see build_parser) or of the library API (see options).
+    Raising ValueError for invalid or conflicting options.
+    """
+
+    global mode_interactive, jobs, gen_jobs, write_dic, use_cache, update, utf8
+    global slots, order, top, max_candidates, max_bytes, evaluate
+    global start_index, count_index, shard_k, shard_n, checkpoint, resume, indexed
+    global sample, sample_mode, seed, dedup, exclude_input, dedup_memory, dedup_fpr
+    global pval, pval_cpatt, pval_let, pval_num, pval_spec
+    global workdir, ifls, ifl, weights, write_store, ofl, stdoutfd, stdoutatty, compress
+    global wflpatt, wflcpatt, wfllet, wflnum, wflspec, wflcpattprod, wflletprod, wflnumprod, wflspecprod
+    global cachedir, cachesuffix, unitable, tokenstats, tokenprod
+    global progress_interval, stats_json, stagestats
+    
+    mode_interactive= bool(args.mode_interactive)
+    jobs= max(int(args.jobs), 1)
+    gen_jobs= max(int(args.gen_jobs), 1)
+    write_dic= args.write_dic
+    use_cache= not args.no_cache
+    # Incremental analysis of the pwlines appended to the inpwfile since its cached analysis
+    update= args.update
+    if update == True and use_cache == False:
+        raise ValueError("--update requires the analysis cache (no --no-cache)")
+    utf8= args.utf8
+    slots= args.slots
+    order= args.order
+    top= int(float(args.top)) if args.top != "" else None
+    # Budget for the p-value solver
+    max_candidates= int(float(args.max_candidates)) if args.max_candidates != "" else None
+    max_bytes= int(float(args.max_bytes)) if args.max_bytes != "" else None
+    # Target pw list to evaluate the coverage of the new pws against, instead of generating them
+    evaluate= args.evaluate
+    # Candidate index range, shard k/N of it and checkpoint file of the generation
+    start_index= int(float(args.start))
+    count_index= int(float(args.count)) if args.count != "" else None
+    if args.shard != "":
+        (shard_k, shard_n)= [int(part) for part in args.shard.split("/")]
+        if not 1 <= shard_k <= shard_n:
+            raise ValueError("--shard k/N requires 1 <= k <= N")
+    else:
+        (shard_k, shard_n)= (1, 1)
+    checkpoint= args.checkpoint
+    resume= args.resume
+    # Random sample of the new pws instead of all of them
+    sample= int(float(args.sample)) if args.sample != "" else None
+    sample_mode= args.sample_mode
+    seed= int(args.seed) if args.seed != "" else None
+    # Removal of duplicate new pws and of the pws of the inpwfile, memory limit in MB and false positive rate of the Bloom filter
+    dedup= args.dedup
+    exclude_input= args.exclude_input
+    dedup_memory= int(float(args.dedup_memory) *1000000)
+    dedup_fpr= float(args.dedup_fpr)
+    indexed= start_index > 0 or count_index is not None or shard_n > 1 or checkpoint != ""
+    if resume == True and checkpoint == "":
+        raise ValueError("--resume requires --checkpoint")
+    pval= args.pval
+    pval_cpatt= args.pval_cpatt
+    pval_let= args.pval_let
+    pval_num= args.pval_num
+    pval_spec= args.pval_spec
+
+    if pval_cpatt == "":
+        pval_cpatt= pval
+    if pval_let == "":
+        pval_let= pval
+    if pval_num == "":
+        pval_num= pval
+    if pval_spec == "":
+        pval_spec= pval
+
+    pval= float(pval)
+    pval_cpatt= float(pval_cpatt)
+    pval_let= float(pval_let)
+    pval_num= float(pval_num)
+    pval_spec= float(pval_spec)
+
+    workdir= args.workdir
+    # Several inpwfiles (or analysis stores *.npz) get analyzed one by one and merged, weighted by --weights w1,w2,...
+    ifls= args.inpwfile
+    ifl= ifls[0] if ifls else ""
+    if args.weights != "":
+        weights= [float(weight) for weight in (args.weights.split(",") if isinstance(args.weights, str) else args.weights)]
+        if len(weights) != len(ifls):
+            raise ValueError("--weights requires one weight per inpwfile")
+    else:
+        weights= [1.0] *len(ifls)
+    write_store= args.write_store
+    ofl= args.outpwfile
+    # Seconds between two progress lines of the steps [1] and [3] (0: none), monitoring file of the stage statistics
+    progress_interval= float(args.progress)
+    stats_json= args.stats_json
+
+    # The original stdout for streaming the new pws ("-"), the printouts may get redirected
+    stdoutfd= sys.__stdout__.fileno()
+    stdoutatty= sys.__stdout__.isatty()
+
+    # Compression of the outpwfile, by default following its file extension
+    compress= args.compress
+    if compress == "":
+        compress= "none"
+        for codec in codecs:
+            if ofl.endswith(codecs[codec][2]):
+                compress= codec
+
+    if sample is not None and (indexed == True or top is not None):
+        raise ValueError("--sample cannot be combined with --top, --start, --count, --shard or --checkpoint")
+    if indexed == True and order != "pattern":
+        raise ValueError("the candidate index (--start, --count, --shard, --checkpoint) is defined in pattern order only")
+    if checkpoint != "" and (dedup == True or exclude_input == True):
+        raise ValueError("--checkpoint cannot resume the memory of --dedup and --exclude-input")
+    if checkpoint != "" and compress != "none":
+        raise ValueError("--checkpoint cannot resume a compressed outpwfile")
+    if evaluate != "" and (order != "pattern" or sample is not None or exclude_input == True):
+        raise ValueError("--evaluate ranks the new pws in pattern order, it cannot be combined with --order probability, --sample or --exclude-input")
+
+    wflpatt= workdir+ "/"+ "patt.dic"
+    wflcpatt= workdir +"/" +"cpatt.dic"
+    wfllet= workdir +"/" +"let.dic"
+    wflnum= workdir +"/" +"num.dic"
+    wflspec= workdir +"/" +"spec.dic"
+    wflcpattprod= workdir +"/" +"cpattprod.dic"
+    wflletprod= workdir +"/" +"letprod.dic"
+    wflnumprod= workdir +"/" +"numprod.dic"
+    wflspecprod= workdir +"/" +"specprod.dic"
+
+    # Analysis cache
+    cachedir= workdir +"/" +"pwanalygen.cache"
+    cachesuffix= cachesuffixes[1] if utf8 == True else cachesuffixes[0]
+
+    # UTF-8 mode: Unicode class table of the BMP code points (see unicodeclasses)
+    if utf8 == True:
+        unitable= np.array([unicodeclasses.get(unicodedata.category(chr(i))[0], ord("$")) for i in range(0, 0x10000)], dtype=np.uint8)
+        unitable[10]= 10
+
+    # No results of a previous configuration
+    tokenstats= {}
+    tokenprod= {}
+    stagestats= {}
+
+
+
+################################################################################
+
+### Tokenizer tables
+
+
+# Version of the tokenizer, part of the analysis cache key, together with the UTF-8 mode
+tokenizer_version= "2"
+cachesuffixes= ("-" +tokenizer_version +".npz", "-" +tokenizer_version +"u.npz")
+
+# Block size for reading the inpwfile
+blocksize= 16 *1024 *1024
+# Batch size of the generated pws for the progress counting
+progressbatch= 1024 *1024
+
+# Byte class table: letters -> "A", numbers -> "1", all other bytes -> "$" (special symbol), except the newline
+clstable= bytearray(b"$" *256)
+for i in range (48, 58):
+    clstable[i]= ord("1")
+for i in range (65, 91):
+    clstable[i]= ord("A")
+for i in range (97, 123):
+    clstable[i]= ord("A")
+clstable[10]= 10
+clstable= bytes(clstable)
 
-wflpatt= workdir+ "/"+ "patt.dic"
-wflcpatt= workdir +"/" +"cpatt.dic"
-wfllet= workdir +"/" +"let.dic"
-wflnum= workdir +"/" +"num.dic"
-wflspec= workdir +"/" +"spec.dic"
-wflcpattprod= workdir +"/" +"cpattprod.dic"
-wflletprod= workdir +"/" +"letprod.dic"
-wflnumprod= workdir +"/" +"numprod.dic"
-wflspecprod= workdir +"/" +"specprod.dic"
+# Substring split tables, derived from the byte class table: 
+# The bytes of the other classes get translated to separators, blanks for let and num, newlines for spec
+lettable= bytes(i if clstable[i] == ord("A") else 32 for i in range(0, 256))
+numtable= bytes(i if clstable[i] == ord("1") else 32 for i in range(0, 256))
+# A chr(2) splits the special symbol substrings, too
+spectable= bytes(i if clstable[i] == ord("$") and i != 2 else 10 for i in range(0, 256))
+
+# Symbol runs of a pwline by the byte class table, the newline excluded (see rank_pw)
+symbolruns= re.compile(rb"[A-Za-z]+|[0-9]+|[^A-Za-z0-9\n]+")
+
+# Symbol runs up to this length get condensed to one symbol by the pw pattern aggregation 
+maxcondenserun= 398
+
+# Pwlines with non-ASCII bytes (exotic language symbols), including their newline
+nonasciiline= re.compile(rb"^[^\n]*[\x80-\xff][^\n]*\n?", re.MULTILINE)
+
+# UTF-8 mode: Unicode class table of the BMP code points by their Unicode category: 
+# letters (L*) and combining marks (M*) -> "A", numbers (N*) -> "1", all others -> "$" (special symbol), except the newline
+# The code points beyond the BMP get classified by unicodedata once per distinct code point of a buffer
+unicodeclasses= {"L": ord("A"), "M": ord("A"), "N": ord("1")}
 
 
 
@@ -81,634 +325,2485 @@ wflspecprod= workdir +"/" +"specprod.dic"
 ### Functions
 
 
-def read_inpwfile():
+def tokenize(buf):
 
     """
-    Reading the inpwfile separating the pwlines into the workfiles "patt.dic", "cpatt.dic", "let.dic", "num.dic" and "spec.dic"
-    """   
+    Tokenizing a buffer of complete, newline separated (ascii) pwlines in one translate and split scan per output category.
+    Every byte gets classified by the byte class table "clstable" and its derived split tables.
+    Returning the lists of the pw patterns, the condensed pw patterns, the let, the num and the spec substrings. 
+    """
+
+    # Pw pattern: letters -> "A", numbers -> "1", special symbols -> "$" 
+    bufpatt= buf.translate(clstable)
+    bufcpatt= condense(bufpatt)
     
-    print("")
-    print("")
-    print("Reading the inpwfile   " +ifl +"   and pre-processing it ...")
+    patt= bufpatt.split(b"\n")
+    cpatt= bufcpatt.split(b"\n")
+    let= buf.translate(lettable).split()
+    num= buf.translate(numtable).split()
+    # Blanks do not separate special symbol substrings
+    spec= buf.replace(b" ", b"").translate(spectable).split(b"\n")
     
-    # Open for byte read
-    fdrifl = open(ifl, "rb")
-    # Open for utf-8 write
-    fdwpatt= open(wflpatt, "w")
-    fdwcpatt= open(wflcpatt, "w")
-    fdwlet = open(wfllet, "w")
-    fdwnum = open(wflnum, "w")
-    fdwspec = open(wflspec, "w")
+    return (list(filter(None, patt)), list(filter(None, cpatt)), let, num, list(filter(None, spec)))
 
 
-    byteline= b''
-    lineraw= ''
-    for byteline in fdrifl:
 
-        try:
-            # Drop out exotic language symbols
-            lineraw= byteline.decode("ascii")
-            lineraw= lineraw.strip("\n")  
-        except UnicodeDecodeError:
-            lineraw=""
-            print("Ignored: ")
-            print(byteline)
-        
-        
-        ### Drop out special symbols first (for performance reasons): 
-        
-        lineletnum= lineraw
-        for i in range (0, 48):
-            lineletnum= lineletnum.replace(chr(i),"$")
-        for i in range (58, 65):
-            lineletnum= lineletnum.replace(chr(i),"$")
-        for i in range (91, 97):
-            lineletnum= lineletnum.replace(chr(i),"$")
-        for i in range (123, 256):
-            lineletnum= lineletnum.replace(chr(i),"$")
-     
+def tokenize_utf8(buf):
+
+    """
+    UTF-8 mode of tokenize: Tokenizing a buffer of complete, newline separated, valid UTF-8 pwlines.
+    The buffer gets decoded to an array of code points at once, which get classified by the Unicode class table "unitable".
+    The substrings get re-encoded to UTF-8 by category, with the code points of the other categories replaced by separators.
+    Plain ASCII buffers take the byte path of tokenize, with the identical result.
+    Returning the lists of the pw patterns, the condensed pw patterns, the let, the num and the spec substrings. 
+    """
+
+    if buf.isascii():
+        return tokenize(buf)
     
-         ### Extract pw patttern (-> patt.dic):
-        
-        linepatt= lineletnum
-        for i in range (48, 58):
-            linepatt= linepatt.replace(chr(i),"1")
-        for i in range (65, 91):
-            linepatt= linepatt.replace(chr(i),"A")
-        for i in range (97, 123):
-            linepatt= linepatt.replace(chr(i),"A")
-           
-        if linepatt != "":
-            fdwpatt.write(linepatt +"\n")
-        
-        
-        ### Aggregate pw pattern line to condensed pw pattern line (-> cpatt.dic):
-        
-        linecpatt= linepatt
-        
-        linecpatt= linecpatt.replace("$$$$$$$$$$$$$$$$","$")
-        linecpatt= linecpatt.replace("$$$$$$$$","$")
-        linecpatt= linecpatt.replace("$$$$","$")
-        linecpatt= linecpatt.replace("$$","$") 
-        linecpatt= linecpatt.replace("$$","$")      
-        
-        linecpatt= linecpatt.replace("1111111111111111","1")
-        linecpatt= linecpatt.replace("11111111","1")
-        linecpatt= linecpatt.replace("1111","1")
-        linecpatt= linecpatt.replace("11","1") 
-        linecpatt= linecpatt.replace("11","1")      
-        
-        linecpatt= linecpatt.replace("AAAAAAAAAAAAAAAA","A")
-        linecpatt= linecpatt.replace("AAAAAAAA","A")
-        linecpatt= linecpatt.replace("AAAA","A")
-        linecpatt= linecpatt.replace("AA","A") 
-        linecpatt= linecpatt.replace("AA","A") 
-        
-        if linecpatt != "":
-            fdwcpatt.write(linecpatt +"\n")
-            
-         
-        ### Extract let symbols (-> let.dic):
-        
-        linelet= lineletnum.replace("$", chr(2) )
-        
-        for i in range (48, 58):
-            linelet= linelet.replace(chr(i), chr(2) )
-
-        linelet= linelet.replace(chr(2) *16, chr(2) )
-        linelet= linelet.replace(chr(2) * 8, chr(2) )
-        linelet= linelet.replace(chr(2) * 4, chr(2) )
-        linelet= linelet.replace(chr(2) * 2, chr(2) )
-        linelet= linelet.replace(chr(2) * 2, chr(2) )
-        
-        if linelet != "":
-            lineletlist= linelet.split( chr(2) )       
-            for i in range (0, len(lineletlist)):
-                if lineletlist[i] != "":
-                    fdwlet.write(lineletlist[i] +"\n")  
+    codes= np.frombuffer(buf.decode("utf-8").encode("utf-32-le"), dtype=np.uint32)
+    classes= unitable[np.minimum(codes, 0xFFFF)]
+    beyond= codes > 0xFFFF
+    if beyond.any():
+        (beyondcodes, inverse)= np.unique(codes[beyond], return_inverse=True)
+        classes[beyond]= np.array([unicodeclasses.get(unicodedata.category(chr(code))[0], ord("$")) for code in beyondcodes.tolist()], dtype=np.uint8)[inverse]
     
-        
-        ### Extract num symbols (-> num.dic):
-        
-        linenum= lineletnum.replace("$", chr(2) )
-        
-        for i in range (65, 91):
-            linenum= linenum.replace(chr(i), chr(2) )
-        for i in range (97, 123):
-            linenum= linenum.replace(chr(i), chr(2) ) 
-        
-        linenum= linenum.replace(chr(2) *16, chr(2) )
-        linenum= linenum.replace(chr(2) * 8, chr(2) )
-        linenum= linenum.replace(chr(2) * 4, chr(2) )
-        linenum= linenum.replace(chr(2) * 2, chr(2) )
-        linenum= linenum.replace(chr(2) * 2, chr(2) )
-    
-        if linenum != "":
-            linenumlist= linenum.split(chr(2) )
-            for i in range (0, len(linenumlist)):
-                if linenumlist[i] != "":
-                    fdwnum.write(linenumlist[i] +"\n")
+    bufpatt= classes.tobytes()
+    bufcpatt= condense(bufpatt)
+    
+    patt= bufpatt.split(b"\n")
+    cpatt= bufcpatt.split(b"\n")
+    let= np.where(classes == ord("A"), codes, 32).astype(np.uint32).tobytes().decode("utf-32-le").encode("utf-8").split()
+    num= np.where(classes == ord("1"), codes, 32).astype(np.uint32).tobytes().decode("utf-32-le").encode("utf-8").split()
+    # Blanks do not separate special symbol substrings
+    nonblank= codes != 32
+    spec= np.where((classes == ord("$")) & (codes != 2), codes, 10)[nonblank].astype(np.uint32).tobytes().decode("utf-32-le").encode("utf-8").split(b"\n")
+    
+    return (list(filter(None, patt)), list(filter(None, cpatt)), let, num, list(filter(None, spec)))
 
-        
-        ### Extract special symbols (-> spec.dic):
-        
-        linespec= lineraw.replace(chr(32), "")
-        
-        for i in range (48, 58):
-            linespec= linespec.replace(chr(i), chr(2) )
-        for i in range (65, 91):
-            linespec= linespec.replace(chr(i), chr(2) )
-        for i in range (97, 123):
-            linespec= linespec.replace(chr(i), chr(2) )
-    
-        linespec= linespec.replace(chr(2) *16, chr(2) )
-        linespec= linespec.replace(chr(2) * 8, chr(2) )
-        linespec= linespec.replace(chr(2) * 4, chr(2) )
-        linespec= linespec.replace(chr(2) * 2, chr(2) )
-        linespec= linespec.replace(chr(2) * 2, chr(2) )
-     
-        if linespec != "":
-            linespeclist= linespec.split(chr(2) )
-            for i in range (0, len(linespeclist)):               
-                if linespeclist[i] != "":
-                    fdwspec.write(linespeclist[i] +"\n")
+
+
+def condense(bufpatt):
+
+    """
+    Condensing the pw patterns of a buffer to the condensed pw patterns: keeping the first symbol of every symbol run.
+    Returning the buffer of the condensed pw patterns.
+    """
+
+    arrpatt= np.frombuffer(bufpatt, dtype=np.uint8)
+    runstart= np.empty(arrpatt.shape, dtype=bool)
+    runstart[:1]= True
+    np.not_equal(arrpatt[1:], arrpatt[:-1], out=runstart[1:])
+    # The last run ends at the end of the buffer (a last pwline without its newline)
+    runlen= np.diff(np.append(np.flatnonzero(runstart), arrpatt.shape[0]))
+    if runlen.shape[0] == 0 or runlen.max() <= maxcondenserun:
+        bufcpatt= arrpatt[runstart].tobytes()
+    else:
+        # Very long symbol runs: the original run aggregation cascade works on the whole buffer, as the runs end at the newlines
+        bufcpatt= bufpatt
+        for symbol in (b"$", b"1", b"A"):
+            for cascadelen in (16, 8, 4, 2, 2):
+                bufcpatt= bufcpatt.replace(symbol *cascadelen, symbol)
     
-                  
+    return bufcpatt
+
+
+
+def inpwfile_codec(fl):
+
+    """
+    Detecting the compression codec of the inpwfile (or target list) fl by its magic bytes, the file extension is a hint only. 
+    Returning "none" for a plain text file.
+    """
+
+    fdrifl = open(fl, "rb")
+    magic= fdrifl.read(6)
     fdrifl.close()
-    fdwlet.close()
-    fdwnum.close()
-    fdwspec.close()
-    fdwpatt.close()
-    fdwcpatt.close()
+    for codec in codecs:
+        if magic.startswith(codecs[codec][1]):
+            return codec
     
-    print("")
-    print("")
-    print("Ready. Step [1] 'Reading the inpwfile and pre-processing it' has been completed.")
+    return "none"
+
+
+
+def prefetch_blocks(fdr):
+
+    """
+    Yielding the blocks of the open binary file fdr up to the final empty block. 
+    A reader thread decompresses the next blocks ahead, overlapping with the pre-processing 
+    (the stdlib codecs release the GIL while decompressing).
+    """
+
+    blocks= queue.Queue(4)
     
+    def reader():
+        try:
+            while True:
+                block= fdr.read(blocksize)
+                blocks.put(block)
+                if block == b'':
+                    break
+        except Exception as error:
+            blocks.put(error)
     
-def select_cpatt():
+    thread= threading.Thread(target=reader, daemon=True)
+    thread.start()
+    while True:
+        block= blocks.get()
+        if isinstance(block, Exception):
+            raise block
+        yield block
+        if block == b'':
+            break
+    thread.join()
+
+
+
+def mmap_chunks(fdr, start, end):
 
     """
-    Reading the workfile "cpatt.dic" and computing the relative frequencies.
-    Selecting the condensed pw construction pattern cpatt up to critical p_value. 
-    Writing the workfile "cpattprod.dic".
-    """   
-    
-    global pval_cpatt
-        
+    Yielding the newline aligned chunks of about blocksize of the byte range [start, end) of the open binary file fdr.
+    The file gets memory mapped, each chunk is sliced straight out of the mapping without a read buffer and carry over.
+    """
 
-    if mode_interactive == True:
-        
-        print("")
-        print("")
-        print("Step [2a] Select condensed pw consruction pattern substrings by p-value")
-        print("")    
-        print("High p-values select many outcomes, thus create many pws in the end.")
-        print("But if the p-value is too high, your machine will run into an 'endless' pw generation job.")
-        print("Watch the length of the final result array, that will be printed subsequently.")    
-        while True:
-            print("")
-            print("Set p-value input loop. Press 'Enter' to proceed without any changes.")
-            print("")
-            print("The current p-value for the condensed pw pattern is:   " +str(pval_cpatt))           
-            inputvalue= input("New p-value (between 0.00 and 1.00)?: ")
-            if inputvalue== "":
-                break
-            else:
-                try:
-                    pval_cpatt= float(inputvalue)
-                except ValueError:
-                    print("")
-                    print("")
-                    print("ERROR: wrong input.") 
-        try:
-            os.system("clear")
-        except:
-            pass            
-        
+    if end <= start:
+        return
     
-    print("")
-    print("")
-    print("Processing the condensed pw construction patterns ...")
+    mm= mmap.mmap(fdr.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mm, "madvise"):
+        mm.madvise(mmap.MADV_SEQUENTIAL)
+    pos= start
+    while pos < end:
+        cut= end
+        if pos +blocksize < end:
+            cut= mm.rfind(b"\n", pos, pos +blocksize) +1
+            if cut == 0:
+                # A pwline longer than the blocksize
+                cut= (mm.find(b"\n", pos +blocksize, end) +1) or end
+        yield mm[pos:cut]
+        pos= cut
+    mm.close()
 
 
-    cpatt00= np.array(np.loadtxt(wflcpatt, dtype="S32", delimiter=None ) )
-    # print("")
-    # print("\ncpatt00:")
-    # print(cpatt00)
-    # print(cpatt00.shape)
 
+def block_chunks(blocks):
 
-    cpatt00uniq= np.unique(cpatt00, return_counts=True)
-    # print("")
-    # print("\ncpatt00uniq:")
-    # print(cpatt00uniq)
-    # # print(cpatt00uniq.shape)
+    """
+    Yielding the newline aligned chunks of the blocks (up to the final empty block) of a stream.
+    The incomplete last pwline of a block gets carried over to the next chunk.
+    """
 
+    rest= b''
+    for block in blocks:
+        if block == b'':
+            break
+        cut= block.rfind(b"\n") +1
+        if cut == 0:
+            rest= rest +block
+            continue
+        yield rest +block[:cut]
+        rest= block[cut:]
+    if rest != b'':
+        yield rest
 
-    (values, counts)= cpatt00uniq 
-    cpatt01=np.array((values[0], counts[0]), dtype=[('value', 'S32'), ('count', 'int32')])
-    for i in range(1, values.shape[0]):
-        tupel= (values[i], counts[i])
-        dtype= dtype=[('value','S32'),('count','int32')]
-        cpatt01= np.append(cpatt01, np.array(tupel, dtype= dtype ) )
-    # print("")
-    # print("\ncpatt01:")
-    # print(cpatt01)
-    # print(cpatt01.shape)
 
 
-    cpatt02= np.sort(cpatt01, order='count')
-    cpatt02= cpatt02[range((values.shape[0] -1), -1, -1)]
-    print("")
-    print("\ncpatt02:")
-    print(cpatt02)
-    print(cpatt02.shape)
+def split_inpwfile(jobs, start=0):
 
+    """
+    Splitting the inpwfile from the byte offset start (the beginning of a pwline) to its end into (at most) jobs newline aligned byte ranges of about equal size.
+    Returning the list of the (start, end) byte offsets.
+    A compressed inpwfile cannot be seeked, it is one range (0, None) to be read to its end.
+    """
 
-    cpatt03= np.cumsum(cpatt02['count']) /np.sum(cpatt02['count'])
-    print("")
-    print("\ncpatt03:")
-    print(cpatt03)
-    print(cpatt03.shape)
+    if inpwfile_codec(ifl) != "none":
+        return [(0, None)]
+    
+    size= os.path.getsize(ifl)
+    bounds= [start]
+    fdrifl = open(ifl, "rb")
+    for k in range(1, jobs):
+        fdrifl.seek(max(start +(size -start) *k //jobs, bounds[-1]))
+        # Move on to the start of the next pwline
+        fdrifl.readline()
+        bounds.append(min(fdrifl.tell(), size))
+    fdrifl.close()
+    bounds.append(size)
 
-    cpatt04= cpatt03[cpatt03 < pval_cpatt] 
-    # print("")
-    # print("\ncpatt04:")
-    # print(cpatt04)
-    # print(cpatt04.shape)
+    return [(bounds[k], bounds[k+1]) for k in range(0, len(bounds) -1) if bounds[k] < bounds[k+1]]
 
-    cpatt05= cpatt02[0: cpatt04.shape[0]+1]['value']
-    # print("")
-    # print("\ncpatt05:")
-    # print(cpatt05)
-    # print(cpatt05.shape)
 
 
-    cpatt= np.array(cpatt05, dtype="S32")
-    np.savetxt(wflcpattprod, cpatt, fmt="%s")
-    print("")
-    print("\ncpatt:")
-    print(cpatt)
-    print(cpatt.shape)
-    print("")
-    print("@ pval_cpatt:   " + str(pval_cpatt))
-    print("")
-    print("")
-    print("Ready. Step [2a] 'Selecting the condensed pw construction patterns' has been completed.")    
+def progress_start(stage, unit):
+
+    """
+    Instrumentation: Starting the stage (e.g. "gen_pws") counting its unit (e.g. "pws"), see progress_total for its ETA. 
+    The counters are shared with the forked worker processes. The peak RSS of the process gets reset, thus every stage gets its own peak (see peak_rss).
+    A stage starting worker processes sets progress["workers"] (see progress_end).
+    """
 
+    global progress
     
+    progress= {"stage": stage, "unit": unit, "started": time.monotonic(), "due": time.monotonic() +progress_interval, 
+               "total": None, "inbytes": False, "shared": multiprocessing.get_context("fork").Array("q", 2), "pid": os.getpid(), 
+               "peak_reset": reset_peak(), "workers": False}
+
 
-def select_let():
+
+def progress_total(remaining, inbytes=False):
 
     """
-    Reading the workfile "let.dic" and computing the relative frequencies.
-    Selecting the letter strings up to critical p_value. 
-    Writing the workfile "letprod.dic".
+    Setting the total of the running stage for its ETA: the done part plus the remaining part, 
+    in its unit or (inbytes) in bytes, None if unknown.
     """
 
-    global pval_let
-    global count_let
+    if remaining is None:
+        progress["total"]= None
+    else:
+        progress["total"]= progress["shared"][1 if inbytes == True else 0] +remaining
+    progress["inbytes"]= inbytes
 
 
-    if mode_interactive == True:
-        
-        print("")
-        print("")
-        print("Step [2b] Select letter substrings by p-value")
-        print("")    
-        print("High p-values select many outcomes, thus create many pws in the end.")
-        print("But if the p-value is too high, your machine will run into an 'endless' pw generation job.")
-        print("Watch the length of the final result array, that will be printed subsequently.")    
-        while True:
-            print("")
-            print("Set p-value input loop. Press 'Enter' to proceed without any changes.")
-            print("")
-            print("The current p-value for the letter substrings is:   " + str(pval_let))           
-            inputvalue= input("New p-value (between 0.00 and 1.00)?: ")
-            if inputvalue== "":
-                break
-            else:
-                try:
-                    pval_let= float(inputvalue)
-                except ValueError:
-                    print("")
-                    print("")
-                    print("ERROR: wrong input.") 
-        try:
-            os.system("clear")
-        except:
-            pass
-                
 
-    print("")
-    print("")
-    print("Processing the letter substrings ...")
-    
+def progress_add(count, nbytes):
 
-    let00= np.array(np.loadtxt(wfllet, dtype="S32", delimiter=None ) )
-    # print("")
-    # print("\nlet00:")
-    # print(let00)
-    # print(let00.shape)
-    
-    
-    let00uniq= np.unique(let00, return_counts=True)
-    # print("")
-    # print("\nlet00uniq:")
-    # print(let00uniq)
-    # # print(let00uniq.shape)
-    
-    
-    (values, counts)= let00uniq 
-    let01=np.array((values[0], counts[0]), dtype=[('value', 'S32'), ('count', 'int32')])
-    for i in range(1, values.shape[0]):
-        tupel= (values[i], counts[i])
-        dtype= dtype=[('value','S32'),('count','int32')]
-        let01= np.append(let01, np.array(tupel, dtype= dtype ) )
-    # print("")
-    # print("\nlet01:")
-    # print(let01)
-    # print(let01.shape)
-    
-    
-    let02= np.sort(let01, order='count')
-    let02= let02[range((values.shape[0] -1), -1, -1)]
-    print("")
-    print("\nlet02:")
-    print(let02)
-    print(let02.shape)
-    
-    
-    let03= np.cumsum(let02['count']) /np.sum(let02['count'])
-    print("")
-    print("\nlet03:")
-    print(let03)
-    print(let03.shape)
-    
-    
-    let04= let03[let03 < pval_let] 
-    # print("")
-    # print("\nlet04:")
-    # print(let04)
-    # print(let04.shape)
-    
-    
-    let05= let02[0: let04.shape[0]+1]['value']
-    # print("")
-    # print("\nlet05:")
-    # print(let05)
-    # print(let05.shape)
-    
-    
-    let= np.array(let05, dtype="S32")
-    count_let= float(let.shape[0])
-    np.savetxt(wflletprod, let, fmt="%s")
-    print("")
-    print("\nlet:")
-    print(let)
-    print(let.shape)
-    print("")
-    print("@ pval_let:   " + str(pval_let))
-    print("")
-    print("")
-    print("Ready. Step [2b] 'Selecting the letter substrings' has been completed.")    
+    """
+    Adding count units and nbytes bytes to the counters of the running stage. 
+    Called once per chunk, not per pw, thus the hot loops stay untouched. The main process reports, when due.
+    """
 
+    if progress is None:
+        return
     
-    
-def select_num():
+    shared= progress["shared"]
+    with shared.get_lock():
+        shared[0]+= count
+        shared[1]+= nbytes
+    if os.getpid() == progress["pid"]:
+        progress_tick()
+
+
+
+def progress_tick():
 
     """
-    Reading the workfile "num.dic" and computing the relative frequencies.
-    Selecting the num strings up to critical p_value. 
-    Writing the workfile "numprod.dic".
+    Printing the progress line of the running stage, if it is due (every --progress seconds).
     """
 
-    global pval_num
-    global count_num
-    
-    if mode_interactive == True:
-        
-        print("")
-        print("")
-        print("Step [2c] Select number substrings by p-value")
-        print("")    
-        print("High p-values select many outcomes, thus create many pws in the end.")
-        print("But if the p-value is too high, your machine will run into an 'endless' pw generation job.")
-        print("Watch the length of the final result array, that will be printed subsequently.")    
-        while True:
-            print("")
-            print("Set p-value input loop. Press 'Enter' to proceed without any changes.")
-            print("")
-            print("The current p-value for the numercial substrings is:   " + str(pval_num))           
-            inputvalue= input("New p-value (between 0.00 and 1.00)?: ")
-            if inputvalue== "":
-                break
-            else:
-                try:
-                    pval_num= float(inputvalue)
-                except ValueError:
-                    print("")
-                    print("")
-                    print("ERROR: wrong input.") 
-        try:
-            os.system("clear")
-        except:
-            pass
+    if progress_interval > 0 and time.monotonic() >= progress["due"]:
+        progress["due"]= time.monotonic() +progress_interval
+        progress_report()
+
+
+
+def batch_chunks(chunks):
+
+    """
+    Joining the small chunks of the generation engine into batches of about progressbatch bytes, 
+    thus the progress gets counted once per batch (and the outfile gets written once per batch).
+    """
+
+    batch= []
+    batchbytes= 0
+    for chunk in chunks:
+        batch.append(chunk)
+        batchbytes+= len(chunk)
+        if batchbytes >= progressbatch:
+            block= b"".join(batch)
+            progress_add(block.count(b"\n"), batchbytes)
+            yield block
+            batch= []
+            batchbytes= 0
+    if batch:
+        block= b"".join(batch)
+        progress_add(block.count(b"\n"), batchbytes)
+        yield block
+
+
+
+def progress_wait(result):
+
+    """
+    Waiting for the async result of the worker processes, reporting the progress meanwhile.
+    Returning its value.
+    """
 
+    while not result.ready():
+        result.wait(min(progress_interval, 1.0) if progress_interval > 0 else 1.0)
+        progress_tick()
     
+    return result.get()
+
+
+
+def progress_state():
+
+    """
+    Returning the dict of the current statistics of the running stage: seconds, count, bytes, rate, 
+    the done share and the ETA (if its total is known) and the current RSS in MB.
+    """
+
+    (count, nbytes)= (progress["shared"][0], progress["shared"][1])
+    seconds= time.monotonic() -progress["started"]
+    state= {"seconds": round(seconds, 3), progress["unit"]: count, "bytes": nbytes, 
+            progress["unit"] +"_per_s": round(count /seconds) if seconds > 0 else 0, "rss_mb": current_rss()}
+    done= nbytes if progress["inbytes"] == True else count
+    if progress["total"] is not None and progress["total"] > 0:
+        state["done"]= round(min(done /progress["total"], 1.0), 4)
+        if done > 0:
+            state["eta_s"]= round(max(seconds *(progress["total"] -done) /done, 0.0))
+    
+    return state
+
+
+
+def progress_report():
+
+    """
+    Printing the progress line of the running stage and updating the --stats-json file.
+    """
+
+    state= progress_state()
+    line= "[" +progress["stage"] +"]   " +str(state[progress["unit"]]) +" " +progress["unit"]
+    if "done" in state:
+        line= line +" (" +str(round(state["done"] *100, 1)) +"%)"
+    line= line +"   " +str(state[progress["unit"] +"_per_s"]) +" " +progress["unit"] +"/s"
+    if "eta_s" in state:
+        line= line +"   ETA " +str(datetime.timedelta(seconds=state["eta_s"]))
+    line= line +"   RSS " +str(state["rss_mb"]) +" MB"
+    print(line)
+    sys.stdout.flush()
+    save_stats(state)
+
+
+
+def progress_end():
+
+    """
+    Ending the running stage: Printing its timing summary and recording its statistics (-> stagestats, --stats-json).
+    The peak RSS is that of the stage, if it could be reset at its start, otherwise that of the process so far. 
+    A stage with worker processes also gets the largest peak RSS of the finished worker processes so far: 
+    getrusage keeps it over the lifetime of the process, it cannot be reset per stage.
+    """
+
+    global progress
+    
+    state= progress_state()
+    state["peak_rss_mb"]= peak_rss()
+    state["peak_rss_reset"]= progress["peak_reset"]
+    if progress["workers"] == True:
+        state["workers_peak_rss_mb"]= workers_peak_rss()
+    for key in ("done", "eta_s", "rss_mb"):
+        state.pop(key, None)
+    stagestats[progress["stage"]]= state
+    peaks= (", peak RSS " if progress["peak_reset"] == True else ", process peak RSS ") +str(state["peak_rss_mb"]) +" MB"
+    if progress["workers"] == True:
+        peaks= peaks +", workers peak RSS " +str(state["workers_peak_rss_mb"]) +" MB"
     print("")
-    print("")
-    print("Processing the numerical substrings ...")
+    print("Stage " +progress["stage"] +":   " +str(state["seconds"]) +" s, " +str(state[progress["unit"]]) +" " +progress["unit"] 
+          +" (" +str(state[progress["unit"] +"_per_s"]) +" " +progress["unit"] +"/s), " +str(round(state["bytes"] /1000000, 1)) +" MB" +peaks)
+    progress= None
+    save_stats(None)
+
+
+
+def current_rss():
+
+    """
+    Returning the current RSS of the (main) process in MB (Linux /proc/self/statm, otherwise its peak RSS).
+    """
+
+    try:
+        fdr= open("/proc/self/statm", "r")
+        pages= int(fdr.read().split()[1])
+        fdr.close()
+        return round(pages *os.sysconf("SC_PAGE_SIZE") /1000000, 1)
+    except (OSError, ValueError, IndexError):
+        return peak_rss()
+
+
+
+def reset_peak():
+
+    """
+    Resetting the peak RSS of the process (Linux /proc/self/clear_refs).
+    Returning False, if the peak cannot be reset, then the peaks are those since the start of the process.
+    """
+
+    try:
+        fdw= open("/proc/self/clear_refs", "w")
+        fdw.write("5")
+        fdw.close()
+    except OSError:
+        return False
     
+    return True
+
+
+
+def peak_rss():
+
+    """
+    Returning the peak RSS of the (main) process in MB since the last reset_peak (Linux /proc/self/status VmHWM, otherwise getrusage).
+    """
+
+    # ru_maxrss and VmHWM are in KiB
+    peak= resource.getrusage(resource.RUSAGE_SELF).ru_maxrss *1024 /1000000
+    try:
+        fdr= open("/proc/self/status", "r")
+        for line in fdr:
+            if line.startswith("VmHWM:"):
+                peak= int(line.split()[1]) *1024 /1000000
+        fdr.close()
+    except (OSError, ValueError, IndexError):
+        pass
     
-    num00= np.array(np.loadtxt(wflnum, dtype="S32", delimiter=None ) )
-    # print("")
-    # print("\nnum00:")
-    # print(num00)
-    # print(num00.shape)
+    return round(peak, 1)
+
+
+
+def workers_peak_rss():
+
+    """
+    Returning the largest peak RSS of the finished worker processes in MB.
+    """
+
+    # ru_maxrss is in KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss *1024 /1000000, 1)
+
+
+
+def save_stats(running):
+
+    """
+    Writing the statistics of the finished stages and of the running stage (running, None if there is none) to the --stats-json file.
+    """
+
+    if stats_json == "":
+        return
     
+    report= {"version": version, "stages": stagestats, "running": None}
+    if running is not None:
+        report["running"]= dict(running, stage=progress["stage"])
+    fdw= open(stats_json +".tmp", "w")
+    json.dump(report, fdw, indent=2)
+    fdw.close()
+    os.replace(stats_json +".tmp", stats_json)
+
+
+
+def read_range(start, end, writedic, wflsuffix=""):
+
+    """
+    Reading the byte range [start, end) of the inpwfile and counting the cpatt, let, num and spec substrings in memory.
+    With writedic the pwlines additionally get separated into the workfiles "patt.dic", "cpatt.dic", "let.dic", "num.dic" and "spec.dic" (+ wflsuffix).
+    The range has to start at the beginning of a pwline. A compressed inpwfile gets decompressed on the fly from start 0 to its end (end None).
+    The pwlines get processed as bytes in large chunks, pwlines with non-ASCII bytes get dropped and counted.
+    Returning the dict of the substring counts by category and the number of dropped pwlines.
+    """
     
-    num00uniq= np.unique(num00, return_counts=True)
-    # print("")
-    # print("\nnum00uniq:")
-    # print(num00uniq)
-    # # print(num00uniq.shape)
+    # Open for byte read
+    codec= inpwfile_codec(ifl)
+    if codec == "none":
+        fdrifl = open(ifl, "rb")
+        chunks= mmap_chunks(fdrifl, start, end)
+    else:
+        fdrifl = codecs[codec][0].open(ifl, "rb")
+        chunks= block_chunks(prefetch_blocks(fdrifl))
+    # Open for byte write
+    if writedic == True:
+        fdwpatt= open(wflpatt +wflsuffix, "wb")
+        fdwcpatt= open(wflcpatt +wflsuffix, "wb")
+        fdwlet = open(wfllet +wflsuffix, "wb")
+        fdwnum = open(wflnum +wflsuffix, "wb")
+        fdwspec = open(wflspec +wflsuffix, "wb")
+        fdwlist= (fdwpatt, fdwcpatt, fdwlet, fdwnum, fdwspec)
+    
+    counts= {"cpatt": Counter(), "let": Counter(), "num": Counter(), "spec": Counter()}
+    ignored= 0
+
+
+    for buf in chunks:
+        
+        (nlines, nbytes)= (buf.count(b"\n"), len(buf))
+        if buf.isascii():
+            (patt, cpatt, let, num, spec)= tokenize(buf)
+        elif utf8 == True:
+            try:
+                buf.decode("utf-8")
+            except UnicodeDecodeError:
+                # Drop out the invalid UTF-8 pwlines
+                buflist= []
+                for byteline in buf.split(b"\n"):
+                    try:
+                        byteline.decode("utf-8")
+                        buflist.append(byteline)
+                    except UnicodeDecodeError:
+                        ignored= ignored +1
+                buf= b"\n".join(buflist)
+            (patt, cpatt, let, num, spec)= tokenize_utf8(buf)
+        else:
+            # Drop out exotic language symbols
+            (buf, dropped)= nonasciiline.subn(b"", buf)
+            ignored= ignored +dropped
+            (patt, cpatt, let, num, spec)= tokenize(buf)
+        counts["cpatt"].update(cpatt)
+        counts["let"].update(let)
+        counts["num"].update(num)
+        counts["spec"].update(spec)
+        
+        if writedic == True:
+            for fdw, tokenlist in zip(fdwlist, (patt, cpatt, let, num, spec)):
+                if tokenlist:
+                    fdw.write(b"\n".join(tokenlist) +b"\n")
+        
+        progress_add(nlines, nbytes)
     
+                  
+    fdrifl.close()
+    if writedic == True:
+        fdwlet.close()
+        fdwnum.close()
+        fdwspec.close()
+        fdwpatt.close()
+        fdwcpatt.close()
     
-    (values, counts)= num00uniq 
-    num01=np.array((values[0], counts[0]), dtype=[('value', 'S32'), ('count', 'int32')])
-    for i in range(1, values.shape[0]):
-        tupel= (values[i], counts[i])
-        dtype= dtype=[('value','S32'),('count','int32')]
-        num01= np.append(num01, np.array(tupel, dtype= dtype ) )
-    # print("")
-    # print("\nnum01:")
-    # print(num01)
-    # print(num01.shape)
+    return (counts, ignored)
+
+
+
+def tail_digest(size):
+
+    """
+    Returning the hash of the last (up to) 65536 bytes of the inpwfile before the byte offset size, the end mark of its analyzed content.
+    """
+
+    fdrifl = open(ifl, "rb")
+    fdrifl.seek(max(size -65536, 0))
+    block= fdrifl.read(size -max(size -65536, 0))
+    fdrifl.close()
+    
+    return hashlib.blake2b(block, digest_size=20).hexdigest()
+
+
+
+def hash_inpwfile(start=0, basehash=""):
+
+    """
+    Returning the content hash of the inpwfile.
+    The hash gets memorized by the path, size and modification time of the inpwfile in the cache index "hashes.json",
+    thus an unchanged inpwfile does not get hashed again. 
+    With start > 0 (--update) only the bytes from start on get hashed, chained to the content hash basehash of the bytes before.
+    """
+
+    stat= os.stat(ifl)
+    path= os.path.realpath(ifl)
+    try:
+        fdr= open(cachedir +"/" +"hashes.json", "r")
+        hashindex= json.load(fdr)
+        fdr.close()
+    except (OSError, ValueError):
+        hashindex= {}
     
+    if path in hashindex and hashindex[path][0:2] == [stat.st_size, stat.st_mtime_ns]:
+        return hashindex[path][2]
     
-    num02= np.sort(num01, order='count')
-    num02= num02[range((values.shape[0] -1), -1, -1)]
-    print("")
-    print("\nnum02:")
-    print(num02)
-    print(num02.shape)
+    hasher= hashlib.blake2b(digest_size=20)
+    fdrifl = open(ifl, "rb")
+    if start > 0:
+        hasher.update(basehash.encode())
+        fdrifl.seek(start)
+    while True:
+        block= fdrifl.read(blocksize)
+        if block == b'':
+            break
+        hasher.update(block)
+    fdrifl.close()
+    contenthash= hasher.hexdigest()
     
+    # The cache entry of the previous content of the inpwfile has become stale
+    if path in hashindex and hashindex[path][2] != contenthash:
+        for suffix in cachesuffixes:
+            try:
+                os.remove(cachedir +"/" +hashindex[path][2] +suffix)
+            except OSError:
+                pass
     
-    num03= np.cumsum(num02['count']) /np.sum(num02['count'])
-    print("")
-    print("\nnum03:")
-    print(num03)
-    print(num03.shape)
+    hashindex[path]= [stat.st_size, stat.st_mtime_ns, contenthash, tail_digest(stat.st_size)]
+    fdw= open(cachedir +"/" +"hashes.json", "w")
+    json.dump(hashindex, fdw)
+    fdw.close()
     
+    return contenthash
+
+
+
+def appended_inpwfile():
+
+    """
+    --update: Checking by the cache index, whether the inpwfile has only grown by appended pwlines since its last analysis, 
+    whose analysis is still in the cache. The end of the analyzed content has to be unchanged and newline terminated.
+    Returning the byte offset of the appended pwlines and the content hash of the analyzed part, None if the inpwfile needs a full analysis.
+    """
+
+    stat= os.stat(ifl)
+    path= os.path.realpath(ifl)
+    try:
+        fdr= open(cachedir +"/" +"hashes.json", "r")
+        hashindex= json.load(fdr)
+        fdr.close()
+    except (OSError, ValueError):
+        hashindex= {}
+    
+    # Entries of previous versions have no end mark
+    if path not in hashindex or len(hashindex[path]) < 4:
+        return None
+    (size, mtime, contenthash, taildigest)= hashindex[path]
+    if stat.st_size <= size or size == 0 or inpwfile_codec(ifl) != "none":
+        return None
+    if not os.path.exists(cachedir +"/" +contenthash +cachesuffix):
+        return None
     
-    num04= num03[num03 < pval_num] 
-    # print("")
-    # print("\nnum04:")
-    # print(num04)
-    # print(num04.shape)
+    fdrifl = open(ifl, "rb")
+    fdrifl.seek(size -1)
+    lastbyte= fdrifl.read(1)
+    fdrifl.close()
+    if lastbyte != b"\n" or tail_digest(size) != taildigest:
+        return None
+    
+    return (size, contenthash)
+
+
+
+def load_store(wflstore):
+
+    """
+    Loading the analysis store file wflstore: the sorted token stores and relative cumulated frequencies of all categories.
+    Returning the dict of them by category, None if the file is no valid store of the current tokenizer.
+    """
+
+    try:
+        store= np.load(wflstore)
+        if "tokenizer" in store.files and str(store["tokenizer"]) != cachesuffix:
+            raise ValueError
+        stats= {}
+        for category in categories:
+            sorted02= {"tokens": store[category +"_tokens"].tobytes(), "offsets": store[category +"_offsets"], "count": store[category +"_count"]}
+            stats[category]= (sorted02, store[category +"_cumfreq"])
+        store.close()
+    except (OSError, ValueError, KeyError):
+        return None
     
+    return stats
+
+
+
+def save_store(wflstore, stats):
+
+    """
+    Saving the sorted token stores and relative cumulated frequencies of all categories stats to the analysis store file wflstore.
+    """
+
+    arrays= {"tokenizer": np.array(cachesuffix)}
+    for category in categories:
+        (sorted02, cumfreq03)= stats[category]
+        arrays[category +"_tokens"]= np.frombuffer(sorted02['tokens'], dtype=np.uint8)
+        arrays[category +"_offsets"]= sorted02['offsets']
+        arrays[category +"_count"]= sorted02['count']
+        arrays[category +"_cumfreq"]= cumfreq03
     
-    num05= num02[0: num04.shape[0]+1]['value']
-    # print("")
-    # print("\nnum05:")
-    # print(num05)
-    #print(num05.shape)
+    # Write to a temporary file first, a crashed run must not leave a broken store file behind
+    fdw= open(wflstore +".tmp", "wb")
+    np.savez(fdw, **arrays)
+    fdw.close()
+    os.replace(wflstore +".tmp", wflstore)
+
+
+
+def load_cache(wflcache):
+
+    """
+    Loading the analysis of the inpwfile from the analysis cache file.
+    Returning the dict of the sorted token stores and relative cumulated frequencies by category, None if there is no valid cache file.
+    """
+
+    stats= load_store(wflcache)
+    if stats is not None:
+        # Mark the cache file as recently used
+        os.utime(wflcache)
+    
+    return stats
+
+
+
+def save_cache(wflcache, stats):
+
+    """
+    Saving the analysis stats of the inpwfile to the analysis cache file.
+    Evicting the least recently used cache files beyond cachekeep (at least the number of inpwfiles), and those of other tokenizer versions.
+    """
+
+    save_store(wflcache, stats)
+    
+    cachefiles= [cachedir +"/" +name for name in os.listdir(cachedir) if name.endswith(".npz")]
+    for wfl in cachefiles:
+        if not wfl.endswith(cachesuffixes):
+            os.remove(wfl)
+    cachefiles= [wfl for wfl in cachefiles if os.path.exists(wfl)]
+    cachefiles.sort(key=os.path.getmtime, reverse=True)
+    for wfl in cachefiles[max(cachekeep, len(ifls)):]:
+        os.remove(wfl)
+    
+    # Forget the hashes of the evicted cache files
+    try:
+        fdr= open(cachedir +"/" +"hashes.json", "r")
+        hashindex= json.load(fdr)
+        fdr.close()
+    except (OSError, ValueError):
+        hashindex= {}
+    hashindex= {path: entry for path, entry in hashindex.items() if any(os.path.exists(cachedir +"/" +entry[2] +suffix) for suffix in cachesuffixes)}
+    fdw= open(cachedir +"/" +"hashes.json", "w")
+    json.dump(hashindex, fdw)
+    fdw.close()
+
+
+
+def analyze_inpwfile(writedic, dicsuffix=""):
+
+    """
+    Reading the (current) inpwfile and counting the cpatt, let, num and spec substrings in memory.
+    With writedic separating the pwlines into the workfiles "patt.dic", "cpatt.dic", "let.dic", "num.dic" and "spec.dic" (+ dicsuffix), too.
+    With jobs > 1 the newline aligned byte ranges of the inpwfile get pre-processed by parallel worker processes, 
+    their counts get merged and their workfile shards get merged in range order. 
+    Sorting the counts of every category by the selection kernel. 
+    Unless disabled by --no-cache, the sorted counts get stored to and, if the inpwfile content is unchanged, loaded from the analysis cache.
+    With --update only the pwlines appended since the cached analysis get read, their counts get added to it.
+    Returning the dict of the sorted token stores and relative cumulated frequencies by category.
+    """   
     
+    start= 0
+    basestats= None
+    if use_cache == True:
+        os.makedirs(cachedir, exist_ok=True)
+        if update == True and writedic == True:
+            print("")
+            print("")
+            print("The workfiles need all pwlines of the inpwfile   " +ifl +"  , --update does not apply.")
+        elif update == True:
+            appended= appended_inpwfile()
+            if appended is not None:
+                basestats= load_cache(cachedir +"/" +appended[1] +cachesuffix)
+            if basestats is not None:
+                (start, basehash)= appended
+        wflcache= cachedir +"/" +(hash_inpwfile(start, basehash) if start > 0 else hash_inpwfile()) +cachesuffix
+        if writedic == False:
+            stats= load_cache(wflcache)
+            if stats is not None:
+                print("")
+                print("")
+                print("The analysis of the inpwfile   " +ifl +"   has been loaded from the cache   " +wflcache +" .")
+                return stats
     
-    num= np.array(num05, dtype="S32")
-    count_num= float(num.shape[0])
-    np.savetxt(wflnumprod, num, fmt="%s")
     print("")
-    print("\nnum:")
-    print(num)
-    print(num.shape)
     print("")
-    print("@ pval_num:   " + str(pval_num))
+    if start > 0:
+        print("Reading the " +str(os.path.getsize(ifl) -start) +" bytes appended to the inpwfile   " +ifl +"   since its cached analysis and pre-processing them ...")
+    else:
+        print("Reading the inpwfile   " +ifl +"   and pre-processing it ...")
+    
+    codec= inpwfile_codec(ifl)
+    if codec != "none":
+        print("")
+        print("The inpwfile is " +codec +" compressed, it gets decompressed on the fly by one process.")
+    else:
+        for extcodec in codecs:
+            if ifl.endswith(codecs[extcodec][2]) and os.path.getsize(ifl) > 0:
+                print("")
+                print("The inpwfile has the extension " +codecs[extcodec][2] +", but no " +extcodec +" header. It gets read as plain text.")
+    
+    ranges= split_inpwfile(jobs, start)
+    progress_total(os.path.getsize(ifl) -start if codec == "none" else None, True)
+    
+    if len(ranges) == 1:
+        (tokencounts, ignored)= read_range(ranges[0][0], ranges[0][1], writedic, dicsuffix)
+    elif len(ranges) == 0:
+        (tokencounts, ignored)= read_range(0, 0, writedic, dicsuffix)
+    
+    else:
+        print("")
+        print("Using " +str(len(ranges)) +" worker processes.")
+        
+        wflsuffixes= [dicsuffix +".part" +str(k) for k in range(0, len(ranges))]
+        # Forked workers share the initialized globals
+        progress["workers"]= True
+        pool= multiprocessing.get_context("fork").Pool(len(ranges))
+        rangecounts= progress_wait(pool.starmap_async(read_range, [(start, end, writedic, wflsuffix) for ((start, end), wflsuffix) in zip(ranges, wflsuffixes)]))
+        pool.close()
+        pool.join()
+        
+        (tokencounts, ignored)= rangecounts[0]
+        for (counts, rangeignored) in rangecounts[1:]:
+            for category in tokencounts:
+                tokencounts[category].update(counts[category])
+            ignored= ignored +rangeignored
+        
+        # Merge the workfile shards in range order, the result is identical to the serial pre-processing
+        if writedic == True:
+            for wfl in (wflpatt, wflcpatt, wfllet, wflnum, wflspec):
+                concat_files([wfl +wflsuffix for wflsuffix in wflsuffixes], wfl +dicsuffix)
+    
+    if ignored > 0:
+        print("")
+        if utf8 == True:
+            print("Ignored " +str(ignored) +" pwlines, that are not valid UTF-8.")
+        else:
+            print("Ignored " +str(ignored) +" pwlines with non-ASCII bytes (exotic language symbols, see --utf8).")
+    
+    stats= {}
+    for category in categories:
+        stats[category]= sort_kernel(count_values(tokencounts[category]))
+    
+    if basestats is not None:
+        stats= merge_stats([basestats, stats], [1, 1])
+    
+    if use_cache == True:
+        save_cache(wflcache, stats)
+    
+    return stats
+
+
+
+def concat_files(wflparts, wfl):
+
+    """
+    Concatenating the files wflparts in their order into the file wfl and deleting them.
+    """
+
+    fdw= open(wfl, "wb")
+    for wflpart in wflparts:
+        fdr= open(wflpart, "rb")
+        shutil.copyfileobj(fdr, fdw, blocksize)
+        fdr.close()
+        os.remove(wflpart)
+    fdw.close()
+
+
+
+def merge_stats(statslist, weights):
+
+    """
+    Merging the analyses statslist of several inpwfiles: The counts of every substring get summed up, weighted by weights.
+    The counts stay integers as long as the weights are integers.
+    Returning the dict of the merged sorted token stores and relative cumulated frequencies by category.
+    """
+
+    integral= all(weight == int(weight) for weight in weights) and all(stats[category][0]['count'].dtype == np.int64 for stats in statslist for category in categories)
+    merged= {}
+    for category in categories:
+        counter= Counter()
+        for (stats, weight) in zip(statslist, weights):
+            store= stats[category][0]
+            counts= store['count'] *(int(weight) if integral == True else weight)
+            for (token, count) in zip(store_tokens(store), counts.tolist()):
+                counter[token]+= count
+        merged[category]= sort_kernel(count_values(counter, np.int64 if integral == True else np.float64))
+    
+    return merged
+
+
+
+def read_inpwfile():
+
+    """
+    Step [1]: Analyzing the inpwfiles one by one (see analyze_inpwfile) and merging their analyses, weighted by --weights (-> tokenstats).
+    An inpwfile *.npz is an analysis store of a previous run (see --write-store), that gets merged without re-reading its pws.
+    In interactive mode or with --write-dic, the workfiles of the inpwfiles get concatenated in their order.
+    Raising ValueError for an inpwfile *.npz, that is no analysis store of this tokenizer version and mode.
+    """
+
+    global tokenstats
+    global ifl
+    
+    # The interactive steps may run in separate sessions, thus they communicate by the workfiles
+    writedic= mode_interactive or write_dic
+    
+    progress_start("read_inpwfile", "lines")
+    statslist= []
+    dicsuffixes= []
+    for k in range(0, len(ifls)):
+        ifl= ifls[k]
+        if ifl.endswith(".npz"):
+            stats= load_store(ifl)
+            if stats is None:
+                raise ValueError("The inpwfile   " +ifl +"   is no analysis store of this tokenizer version and mode.")
+            print("")
+            print("")
+            print("The analysis store   " +ifl +"   has been loaded.")
+            if writedic == True:
+                print("")
+                print("WARNING: An analysis store has no pwlines, the workfiles do not include it.")
+        else:
+            dicsuffix= ".file" +str(k) if len(ifls) > 1 else ""
+            stats= analyze_inpwfile(writedic, dicsuffix)
+            dicsuffixes.append(dicsuffix)
+        statslist.append(stats)
+    
+    if len(ifls) == 1 and weights[0] == 1.0:
+        tokenstats= statslist[0]
+    else:
+        print("")
+        print("")
+        print("Merging the analyses of " +str(len(ifls)) +" inpwfiles (weights " +", ".join([str(weight) for weight in weights]) +") ...")
+        tokenstats= merge_stats(statslist, weights)
+    
+    if writedic == True and len(ifls) > 1:
+        for wfl in (wflpatt, wflcpatt, wfllet, wflnum, wflspec):
+            concat_files([wfl +dicsuffix for dicsuffix in dicsuffixes], wfl)
+    
+    if write_store != "":
+        save_store(write_store, tokenstats)
+        print("")
+        print("The analysis has been stored to   " +write_store +" .")
+    
+    progress_end()
+    
     print("")
     print("")
-    print("Ready. Step [2c] 'Selecting number substrings' has been completed.")    
-    
+    print("Ready. Step [1] 'Reading the inpwfile and pre-processing it' has been completed.")
+
+
+
+def load_dic(wfl):
+
+    """
+    Counting the substrings of an occurrence workfile like "let.dic".
+    Returning the Counter of the substrings.
+    """
+
+    fdr= open(wfl, "rb")
+    counter= Counter(fdr.read().split(b"\n"))
+    fdr.close()
+    del counter[b""]
+    
+    return counter
+
+
+
+def token_store(values, counts):
+
+    """
+    Returning the token store of the substrings values (a list of byte strings) and their counts:
+    The dict of one contiguous bytes buffer "tokens" of all substrings, the array "offsets" of their start positions 
+    (plus the end of the last one) and the int64 array "count". The substrings keep their full length.
+    """
+
+    lens= np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+    
+    return {"tokens": b"".join(values), "offsets": store_offsets(lens), "count": counts}
+
+
+
+def store_offsets(lens):
+
+    """
+    Returning the offsets array of a token store from the lengths of its substrings, int32 as long as the buffer fits into it.
+    """
+
+    offsets= np.concatenate((np.zeros(1, dtype=np.int64), np.cumsum(lens, dtype=np.int64)))
+    if offsets[-1] < 2 **31:
+        return offsets.astype(np.int32)
+    
+    return offsets
+
+
+
+def store_tokens(store, start=0, end=None):
+
+    """
+    Returning the list of the substrings [start, end) of a token store.
+    """
+
+    offsets= store['offsets'][start:(None if end is None else end +1)].tolist()
+    tokens= store['tokens']
+    
+    return [tokens[offsets[i]:offsets[i +1]] for i in range(0, len(offsets) -1)]
+
+
+
+def list_summary(items, n=None):
+
+    """
+    Returning the printout of a list of n items in the numpy array style: Beyond 6 items, the first and the last three items only.
+    """
+
+    if n is None:
+        n= len(items)
+    if n > 6:
+        return "[" +" ".join([repr(item) for item in items[:3]] +["..."] +[repr(item) for item in items[-3:]]) +"]"
+    
+    return "[" +" ".join([repr(item) for item in items]) +"]"
+
+
+
+def store_summary(store):
+
+    """
+    Returning the printout of the (substring, count) items of a token store in the numpy array style.
+    """
+
+    n= store['count'].shape[0]
+    if n > 6:
+        items= list(zip(store_tokens(store, 0, 3) +store_tokens(store, n -3, n), store['count'][[0, 1, 2, n -3, n -2, n -1]].tolist()))
+    else:
+        items= list(zip(store_tokens(store), store['count'].tolist()))
+    
+    return list_summary(items, n)
+
+
+
+def count_values(counter, dtype=np.int64):
+
+    """
+    Returning the token store of a substring Counter, its substrings in ascending order. 
+    """
+    
+    values= sorted(counter)
+    counts= np.fromiter(map(counter.__getitem__, values), dtype=dtype, count=len(values))
+    
+    return token_store(values, counts)
+
+
+
+def category_stats(category, wfl):
+
+    """
+    Returning the sorted (value, count) array and the relative cumulated frequencies of a substring category.
+    They get taken from memory, if step [1] has been run before in the same session, otherwise they get counted from the workfile.
+    """
+
+    if category not in tokenstats:
+        tokenstats[category]= sort_kernel(count_values(load_dic(wfl)))
+    
+    return tokenstats[category]
+    
+    
+    
+def sort_kernel(store):
+
+    """
+    Shared sorting kernel of the steps [1] and [2a] - [2d]:
+    Sorting the substrings of a token store descending by their counts and computing the relative cumulated frequencies.
+    Returning the sorted token store and the relative cumulated frequencies.
+    """
+
+    # Stable ascending sort on the ascending values, reversed: descending counts, ties descending by value
+    order= np.argsort(store['count'], kind="stable")[::-1]
+    
+    # Gathering the bytes of the substrings in the new order in one vectorized step
+    starts= store['offsets'][:-1][order].astype(np.int64)
+    lens= np.diff(store['offsets'])[order]
+    offsets= store_offsets(lens)
+    positions= np.repeat(starts -offsets[:-1], lens) +np.arange(offsets[-1], dtype=np.int64)
+    tokens= np.frombuffer(store['tokens'], dtype=np.uint8)[positions].tobytes()
+    sorted02= {"tokens": tokens, "offsets": offsets, "count": store['count'][order]}
+    
+    cumfreq03= np.cumsum(sorted02['count']) /np.sum(sorted02['count'])
+    
+    return (sorted02, cumfreq03)
+
+
+
+def select_kernel(sorted02, cumfreq03, pval):
+
+    """
+    Shared selection kernel of the steps [2a] - [2d]:
+    Selecting the sorted values up to the critical p-value (at least the first value).
+    Returning the list of the selected substrings.
+    """
+
+    # Number of relative cumulated frequencies below the p-value, plus the one crossing it
+    nselect= np.searchsorted(cumfreq03, pval, side="left") +1
+    selected05= store_tokens(sorted02, 0, nselect)
+    
+    return selected05
+    
+    
+    
+def live_forecast(category, pval):
+
+    """
+    Interactive mode: Printing the selection of the p-value pval for the category, the number of selected outcomes and their covered mass, 
+    and the exact forecast of the pws to generate together with the current p-values of the other categories.
+    The sorted counts stay in memory (tokenstats), thus every new p-value costs a searchsorted lookup only.
+    """
+
+    pvals= {"cpatt": pval_cpatt, "let": pval_let, "num": pval_num, "spec": pval_spec}
+    pvals[category]= pval
+    lens= {}
+    sumlens= {}
+    for selcategory, wfl in zip(categories, (wflcpatt, wfllet, wflnum, wflspec)):
+        (sorted02, cumfreq03)= category_stats(selcategory, wfl)
+        nselect= min(int(np.searchsorted(cumfreq03, pvals[selcategory], side="left")) +1, cumfreq03.shape[0])
+        lens[selcategory]= nselect
+        sumlens[selcategory]= int(sorted02['offsets'][nselect])
+        if selcategory == "cpatt":
+            cpattlist= store_tokens(sorted02, 0, nselect)
+        if selcategory == category:
+            covered= float(cumfreq03[nselect -1]) if nselect > 0 else 0.0
+    
+    (count, nbytes)= (0, 0)
+    for (pattcount, pattbytes) in dims_sizes(cpattlist, lens, sumlens):
+        count= count +pattcount
+        nbytes= nbytes +pattbytes
+    
+    print("")
+    print("Selected outcomes:   " +str(lens[category]) +"   covered mass:   " +str(round(covered, 4)))
+    print("Forecast with the current p-values:   " +str(count) +" pws / " +str(nbytes) +" bytes (" +str(round(nbytes /1000000, 1)) +" MB)")
+
+
+
+def select_cpatt():
+
+    """
+    Taking the sorted cpatt counts of step [1] (or reading the workfile "cpatt.dic") and computing the relative frequencies.
+    Selecting the condensed pw construction pattern cpatt up to critical p_value. 
+    Writing the workfile "cpattprod.dic".
+    """   
+    
+    global pval_cpatt
+        
+
+    if mode_interactive == True:
+        
+        print("")
+        print("")
+        print("Step [2a] Select condensed pw consruction pattern substrings by p-value")
+        print("")    
+        print("High p-values select many outcomes, thus create many pws in the end.")
+        print("But if the p-value is too high, your machine will run into an 'endless' pw generation job.")
+        print("Watch the length of the final result array, that will be printed subsequently.")    
+        while True:
+            print("")
+            print("Set p-value input loop. Press 'Enter' to proceed without any changes.")
+            print("")
+            print("The current p-value for the condensed pw pattern is:   " +str(pval_cpatt))           
+            live_forecast("cpatt", pval_cpatt)
+            inputvalue= input("New p-value (between 0.00 and 1.00)?: ")
+            if inputvalue== "":
+                break
+            else:
+                try:
+                    pval_cpatt= float(inputvalue)
+                except ValueError:
+                    print("")
+                    print("")
+                    print("ERROR: wrong input.") 
+        try:
+            os.system("clear")
+        except:
+            pass            
+        
+    
+    print("")
+    print("")
+    print("Processing the condensed pw construction patterns ...")
+
+
+    (cpatt02, cpatt03)= category_stats("cpatt", wflcpatt)
+    cpatt05= select_kernel(cpatt02, cpatt03, pval_cpatt)
+    print("")
+    print("\ncpatt02:")
+    print(store_summary(cpatt02))
+    print(cpatt02['count'].shape)
+    
+    
+    print("")
+    print("\ncpatt03:")
+    print(cpatt03)
+    print(cpatt03.shape)
+    
+    
+    # print("")
+    # print("\ncpatt05:")
+    # print(cpatt05)
+    # print(cpatt05.shape)
+    
+    
+    cpatt= cpatt05
+    save_prod(wflcpattprod, cpatt)
+    tokenprod["cpatt"]= cpatt
+    print("")
+    print("\ncpatt:")
+    print(list_summary(cpatt))
+    print((len(cpatt),))
+    print("")
+    print("@ pval_cpatt:   " + str(pval_cpatt))
+    print("")
+    print("")
+    print("Ready. Step [2a] 'Selecting the condensed pw construction patterns' has been completed.")    
+
+    
+
+def select_let():
+
+    """
+    Taking the sorted let counts of step [1] (or reading the workfile "let.dic") and computing the relative frequencies.
+    Selecting the letter strings up to critical p_value. 
+    Writing the workfile "letprod.dic".
+    """
+
+    global pval_let
+
+
+    if mode_interactive == True:
+        
+        print("")
+        print("")
+        print("Step [2b] Select letter substrings by p-value")
+        print("")    
+        print("High p-values select many outcomes, thus create many pws in the end.")
+        print("But if the p-value is too high, your machine will run into an 'endless' pw generation job.")
+        print("Watch the length of the final result array, that will be printed subsequently.")    
+        while True:
+            print("")
+            print("Set p-value input loop. Press 'Enter' to proceed without any changes.")
+            print("")
+            print("The current p-value for the letter substrings is:   " + str(pval_let))           
+            live_forecast("let", pval_let)
+            inputvalue= input("New p-value (between 0.00 and 1.00)?: ")
+            if inputvalue== "":
+                break
+            else:
+                try:
+                    pval_let= float(inputvalue)
+                except ValueError:
+                    print("")
+                    print("")
+                    print("ERROR: wrong input.") 
+        try:
+            os.system("clear")
+        except:
+            pass
+                
+
+    print("")
+    print("")
+    print("Processing the letter substrings ...")
+    
+
+    (let02, let03)= category_stats("let", wfllet)
+    let05= select_kernel(let02, let03, pval_let)
+    print("")
+    print("\nlet02:")
+    print(store_summary(let02))
+    print(let02['count'].shape)
+    
+    
+    print("")
+    print("\nlet03:")
+    print(let03)
+    print(let03.shape)
+    
+    
+    # print("")
+    # print("\nlet05:")
+    # print(let05)
+    # print(let05.shape)
+    
+    
+    let= let05
+    save_prod(wflletprod, let)
+    tokenprod["let"]= let
+    print("")
+    print("\nlet:")
+    print(list_summary(let))
+    print((len(let),))
+    print("")
+    print("@ pval_let:   " + str(pval_let))
+    print("")
+    print("")
+    print("Ready. Step [2b] 'Selecting the letter substrings' has been completed.")    
+
+    
+    
+def select_num():
+
+    """
+    Taking the sorted num counts of step [1] (or reading the workfile "num.dic") and computing the relative frequencies.
+    Selecting the num strings up to critical p_value. 
+    Writing the workfile "numprod.dic".
+    """
+
+    global pval_num
+    
+    if mode_interactive == True:
+        
+        print("")
+        print("")
+        print("Step [2c] Select number substrings by p-value")
+        print("")    
+        print("High p-values select many outcomes, thus create many pws in the end.")
+        print("But if the p-value is too high, your machine will run into an 'endless' pw generation job.")
+        print("Watch the length of the final result array, that will be printed subsequently.")    
+        while True:
+            print("")
+            print("Set p-value input loop. Press 'Enter' to proceed without any changes.")
+            print("")
+            print("The current p-value for the numercial substrings is:   " + str(pval_num))           
+            live_forecast("num", pval_num)
+            inputvalue= input("New p-value (between 0.00 and 1.00)?: ")
+            if inputvalue== "":
+                break
+            else:
+                try:
+                    pval_num= float(inputvalue)
+                except ValueError:
+                    print("")
+                    print("")
+                    print("ERROR: wrong input.") 
+        try:
+            os.system("clear")
+        except:
+            pass
+
+    
+    print("")
+    print("")
+    print("Processing the numerical substrings ...")
+    
+    
+    (num02, num03)= category_stats("num", wflnum)
+    num05= select_kernel(num02, num03, pval_num)
+    print("")
+    print("\nnum02:")
+    print(store_summary(num02))
+    print(num02['count'].shape)
+    
+    
+    print("")
+    print("\nnum03:")
+    print(num03)
+    print(num03.shape)
+    
+    
+    # print("")
+    # print("\nnum05:")
+    # print(num05)
+    # print(num05.shape)
+    
+    
+    num= num05
+    save_prod(wflnumprod, num)
+    tokenprod["num"]= num
+    print("")
+    print("\nnum:")
+    print(list_summary(num))
+    print((len(num),))
+    print("")
+    print("@ pval_num:   " + str(pval_num))
+    print("")
+    print("")
+    print("Ready. Step [2c] 'Selecting number substrings' has been completed.")    
+    
+    
+
+def select_spec():
+
+    """
+    Taking the sorted spec counts of step [1] (or reading the workfile "spec.dic") and computing the relative frequencies.
+    Selecting the spec strings up to critical p_value. 
+    Writing the workfile "specprod.dic".
+    """
+
+    global pval_spec
+
+    if mode_interactive == True:
+        
+        print("")
+        print("")
+        print("Step [2d] Select special character substrings by p-value")
+        print("")    
+        print("High p-values select many outcomes, thus create many pws in the end.")
+        print("But if the p-value is too high, your machine will run into an 'endless' pw generation job.")
+        print("Watch the length of the final result array, that will be printed subsequently.")    
+        while True:
+            print("")
+            print("Set p-value input loop. Press 'Enter' to proceed without any changes.")
+            print("")
+            print("The current p-value for the special character substrings is:   " + str(pval_spec))           
+            live_forecast("spec", pval_spec)
+            inputvalue= input("New p-value (between 0.00 and 1.00)?: ")
+            if inputvalue== "":
+                break
+            else:
+                try:
+                    pval_spec= float(inputvalue)
+                except ValueError:
+                    print("")
+                    print("")
+                    print("ERROR: wrong input.")
+        try:
+            os.system("clear")
+        except:
+            pass
+                    
+
+    print("")
+    print("")
+    print("Processing the special character substrings ...")  
+
+
+    (spec02, spec03)= category_stats("spec", wflspec)
+    spec05= select_kernel(spec02, spec03, pval_spec)
+    print("")
+    print("\nspec02:")
+    print(store_summary(spec02))
+    print(spec02['count'].shape)
+    
+    
+    print("")
+    print("\nspec03:")
+    print(spec03)
+    print(spec03.shape)
+    
+    
+    # print("")
+    # print("\nspec05:")
+    # print(spec05)
+    # print(spec05.shape)
+    
+    
+    spec= spec05
+    save_prod(wflspecprod, spec)
+    tokenprod["spec"]= spec
+    print("")
+    print("\nspec:")
+    print(list_summary(spec))
+    print((len(spec),))
+    print("")
+    print("@ pval_let:   " + str(pval_let))
+    print("")
+    print("")
+    print("Ready. Step [2d] 'Selecting the special characters substrings' has been completed.")    
+
+
+    
+def save_prod(wfl, tokens):
+
+    """
+    Writing the selected substrings to the workfile wfl, one repr of a byte string per line.
+    """
+
+    fdw= open(wfl, "w")
+    fdw.write("".join([repr(token) +"\n" for token in tokens]))
+    fdw.close()
+
+
+
+def prod_lists():
+
+    """
+    Returning the list of the selected condensed pw patterns and the dict of the selected substring lists by category.
+    """
+
+    cpattlist= prod_tokens("cpatt", wflcpattprod)
+    prodlists= {"let": prod_tokens("let", wflletprod), "num": prod_tokens("num", wflnumprod), "spec": prod_tokens("spec", wflspecprod)}
+    
+    return (cpattlist, prodlists)
+
+
+
+def prod_tokens(category, wfl):
+
+    """
+    Returning the list of the selected substrings of a category.
+    They get taken from memory, if its selection step has been run before in the same session, otherwise they get read from the workfile.
+    """
+
+    if category not in tokenprod:
+        # The workfile lines are the reprs of the selected byte strings
+        fdr= open(wfl, "r")
+        tokenprod[category]= [ast.literal_eval(line) for line in fdr if line.strip() != ""]
+        fdr.close()
+    
+    return tokenprod[category]
+
+
+
+def index_digits(index, radices):
+
+    """
+    Returning the mixed radix digits of the index for the radices (the first digit most significant).
+    """
+
+    digits= []
+    for radix in reversed(radices):
+        (index, digit)= divmod(index, radix)
+        digits.append(digit)
+    
+    return digits[::-1]
+
+
+
+def product_from(lists, digits):
+
+    """
+    Yielding the product of the lists in the order of itertools.product, from the combination with the indexes digits on:
+    the combination itself, then for every position from the last to the first one, the combinations with the same 
+    items before it, a later item at it and any items after it.
+    """
+
+    yield tuple(lists[dim][digits[dim]] for dim in range(0, len(lists)))
+    for dim in range(len(lists) -1, -1, -1):
+        yield from itertools.product(*([[lists[fixed][digits[fixed]]] for fixed in range(0, dim)] +[lists[dim][digits[dim] +1:]] +lists[dim +1:]))
+
+
+
+def gen_product(dimlists, slotdims, start=0, end=None):
+
+    """
+    Generation engine: 
+    Concatenating the new pws over the product of the substring lists dimlists (the first one in the outermost loop),
+    slotdims giving the dimlists index of every pw pattern slot.
+    The last dimension gets assembled at once for every outer loop combination.
+    Optionally only the pws of the index range [start, end) of the product, the index of a pw being the mixed radix number 
+    of its dimlists indexes.
+    Yielding the new pws in chunks of newline terminated lines.
+    """
+
+    if len(dimlists) == 0 or min(len(dimlist) for dimlist in dimlists) == 0:
+        return
+    
+    last= len(dimlists) -1
+    lastlist= dimlists[last]
+    holes= slotdims.count(last)
+    
+    radix= len(lastlist)
+    if end is None:
+        end= math.prod(len(dimlist) for dimlist in dimlists)
+    if start >= end:
+        return
+    # The first and the last outer loop combination of the range, the range cuts their last dimension
+    (outerstart, laststart)= divmod(start, radix)
+    (outerend, lastend)= divmod(end -1, radix)
+    outerindex= outerstart
+    
+    for outer in product_from(dimlists[:-1], index_digits(outerstart, [len(dimlist) for dimlist in dimlists[:-1]])):
+        tokens= lastlist
+        if outerindex == outerstart or outerindex == outerend:
+            tokens= lastlist[(laststart if outerindex == outerstart else 0):(lastend +1 if outerindex == outerend else radix)]
+        if holes == 1:
+            # prefix + token + suffix for every token of the last dimension, in one join
+            hole= slotdims.index(last)
+            prefix= b"".join([outer[dim] for dim in slotdims[:hole]])
+            suffix= b"".join([outer[dim] for dim in slotdims[hole+1:]]) +b"\n"
+            yield prefix +(suffix +prefix).join(tokens) +suffix
+        else:
+            # The token of the last dimension fills several slots
+            template= b"".join([b"%s" if dim == last else outer[dim].replace(b"%", b"%%") for dim in slotdims]) +b"\n"
+            yield b"".join([template %((token,) *holes) for token in tokens])
+        if outerindex == outerend:
+            break
+        outerindex= outerindex +1
+
+
+
+def pattern_dims(cpatt):
+
+    """
+    Returning the loop dimensions of a condensed pw pattern, as the list of their substring categories, and the loop dimension of every pattern slot.
+    Independent slots: every slot is a loop dimension of its own, e.g. 'A1A' -> let x num x let.
+    Shared slots (legacy): every category is one loop dimension, in the loop order let, num, spec; repeated symbols of a category share the same substring.
+    """
+
+    if slots == "shared":
+        dims= [category for category in ("let", "num", "spec") if categorysymbols[category] in cpatt]
+        slotdims= [dims.index(symbolcategories[symbol]) for symbol in cpatt]
+    else:
+        dims= [symbolcategories[symbol] for symbol in cpatt]
+        slotdims= list(range(0, len(cpatt)))
+    
+    return (dims, slotdims)
+
+
+
+def gen_chunks(cpattlist, prodlists, pattslices=None):
+
+    """
+    Generating the new pws of the condensed pw patterns cpattlist from the selected substring lists prodlists (by category),
+    lazily over the product of the loop dimensions of every pattern.
+    Optionally only the (pattern index, start, end) slices pattslices of the first loop dimension of the patterns.
+    Yielding the new pws in chunks of newline terminated lines.
+    """
+
+    if pattslices is None:
+        pattslices= [(pattidx, 0, None) for pattidx in range(0, len(cpattlist))]
+    
+    for (pattidx, start, end) in pattslices:
+        (dims, slotdims)= pattern_dims(cpattlist[pattidx])
+        dimlists= [prodlists[category] for category in dims]
+        dimlists[0]= dimlists[0][start:end]
+        yield from gen_product(dimlists, slotdims)
+
+
+
+def gen_range(cpattlist, prodlists, start, end):
+
+    """
+    Generating the new pws of the global candidate index range [start, end). 
+    The global candidate index numbers the pws in pattern order: the pws of a pattern follow those of the previous patterns,
+    within a pattern it is the mixed radix number of the loop dimension indexes (the first loop dimension most significant).
+    Yielding the new pws in chunks of newline terminated lines.
+    """
+
+    offset= 0
+    for (cpatt, (pattcount, pattbytes)) in zip(cpattlist, pattern_sizes(cpattlist, prodlists)):
+        if offset < end and start < offset +pattcount:
+            (dims, slotdims)= pattern_dims(cpatt)
+            dimlists= [prodlists[category] for category in dims]
+            yield from gen_product(dimlists, slotdims, max(start -offset, 0), min(end -offset, pattcount))
+        offset= offset +pattcount
+
+
+
+def unrank(index, cpattlist, prodlists, pattends=None):
+
+    """
+    Returning the new pw of the global candidate index (see gen_range), without generating the pws before it.
+    pattends are the cumulated numbers of pws of the patterns, they get computed, if not given.
+    """
+
+    if pattends is None:
+        pattends= list(itertools.accumulate(size[0] for size in pattern_sizes(cpattlist, prodlists)))
+    
+    pattidx= bisect.bisect_right(pattends, index)
+    (dims, slotdims)= pattern_dims(cpattlist[pattidx])
+    dimlists= [prodlists[category] for category in dims]
+    digits= index_digits(index -(pattends[pattidx -1] if pattidx > 0 else 0), [len(dimlist) for dimlist in dimlists])
+    
+    return b"".join([dimlists[dim][digits[dim]] for dim in slotdims])
+
+
+
+def rank_tables(cpattlist, prodlists):
+
+    """
+    Returning the lookup tables of rank_pw: the dict of the (first global candidate index, loop dimensions, slot dimensions, radices) 
+    by selected condensed pw pattern and the dicts of the positions of the selected substrings by category.
+    """
+
+    pattranks= {}
+    first= 0
+    for (cpatt, (pattcount, pattbytes)) in zip(cpattlist, pattern_sizes(cpattlist, prodlists)):
+        (dims, slotdims)= pattern_dims(cpatt)
+        pattranks[cpatt]= (first, dims, slotdims, [len(prodlists[category]) for category in dims])
+        first= first +pattcount
+    positions= {category: {token: k for (k, token) in enumerate(prodlists[category])} for category in prodlists}
+    
+    return (pattranks, positions)
+
+
+
+def utf8_runs(pw):
+
+    """
+    UTF-8 mode: Returning the condensed pw pattern and the list of the symbol runs of the pwline pw, 
+    every code point classified like tokenize_utf8 does. Raising UnicodeDecodeError for an invalid pwline.
+    """
+
+    text= pw.decode("utf-8")
+    classes= [int(unitable[ord(char)]) if ord(char) < 0x10000 else unicodeclasses.get(unicodedata.category(char)[0], ord("$")) for char in text]
+    cpatt= bytearray()
+    runs= []
+    for (cls, group) in itertools.groupby(zip(classes, text), key=lambda item: item[0]):
+        cpatt.append(cls)
+        runs.append("".join([char for (cls, char) in group]).encode("utf-8"))
+    
+    return (bytes(cpatt), runs)
+
+
+
+def rank_pw(pw, tables):
+
+    """
+    Returning the global candidate index (see gen_range) of the pwline pw (without its newline) among the new pws, 
+    None if the selection does not generate it, by lookups only (tables see rank_tables), thus without generating any pw:
+    The symbol runs of pw are the slots of its condensed pw pattern, which must be selected, every run must be a selected substring of its category 
+    and with shared slots the runs of a category must be the same substring. The index is the inverse of unrank.
+    """
+
+    (pattranks, positions)= tables
+    if pw.isascii():
+        runs= symbolruns.findall(pw)
+        cpatt= bytes([clstable[run[0]] for run in runs])
+    elif utf8 == True:
+        try:
+            (cpatt, runs)= utf8_runs(pw)
+        except UnicodeDecodeError:
+            return None
+    else:
+        # The analysis ignores the non-ASCII pwlines, they never get generated
+        return None
+    
+    if cpatt not in pattranks:
+        return None
+    (first, dims, slotdims, radices)= pattranks[cpatt]
+    digits= [None] *len(dims)
+    for (run, dim) in zip(runs, slotdims):
+        position= positions[dims[dim]].get(run)
+        if position is None or (digits[dim] is not None and digits[dim] != position):
+            return None
+        digits[dim]= position
+    index= 0
+    for (digit, radix) in zip(digits, radices):
+        index= index *radix +digit
+    
+    return first +index
+
+
+
+def index_range(total):
+
+    """
+    Returning the candidate index range [start, end) to generate out of the total number of pws: 
+    --start and --count, then the shard k/N of that range.
+    """
+
+    start= min(start_index, total)
+    end= total if count_index is None else min(start +count_index, total)
+    
+    return (start +(shard_k -1) *(end -start) //shard_n, start +shard_k *(end -start) //shard_n)
+
+
+
+def selection_hash(cpattlist, prodlists):
+
+    """
+    Returning the content hash of the selected patterns and substrings, a checkpoint is valid for the same selection only.
+    """
+
+    hasher= hashlib.blake2b(digest_size=20)
+    hasher.update(slots.encode() +b"\n")
+    for tokenlist in [cpattlist] +[prodlists[category] for category in ("let", "num", "spec")]:
+        hasher.update(b"\n".join(tokenlist) +b"\n\n")
+    
+    return hasher.hexdigest()
+
+
+
+def save_checkpoint(state):
+
+    """
+    Saving the generation state (the index range, the next index to generate and the bytes written so far) to the checkpoint file.
+    """
+
+    fdw= open(checkpoint +".tmp", "w")
+    json.dump(state, fdw)
+    fdw.close()
+    os.replace(checkpoint +".tmp", checkpoint)
+
+
+
+def gen_shard(pattslices, wflshard):
+
+    """
+    Generation worker: Generating the pattern slices pattslices into the shard file wflshard.
+    With --compress every worker compresses its own shard, the concatenated compressed shards are a valid multi-stream file.
+    """
+
+    (cpattlist, prodlists)= prod_lists()
+    fdwshard= open(wflshard, "wb", buffering=blocksize)
+    if compress != "none":
+        fdwcodec= compress_outfile(fdwshard)
+    else:
+        fdwcodec= fdwshard
+    for chunk in batch_chunks(gen_chunks(cpattlist, prodlists, pattslices)):
+        fdwcodec.write(chunk)
+    fdwcodec.close()
+    fdwshard.close()
+
+
+
+def open_outpwfile(ofl):
+
+    """
+    Opening the outpwfile for buffered binary writing in large batches: "-" is the stdout, a named pipe gets opened like a file.
+    """
+
+    if ofl == "-":
+        return open(stdoutfd, "wb", buffering=blocksize, closefd=False)
+    
+    return open(ofl, "wb", buffering=blocksize)
+
+
+
+def compress_outfile(fdw):
+
+    """
+    Wrapping the open binary outfile fdw into a file object compressing by the --compress codec. 
+    Closing it does not close fdw.
+    """
+
+    if compress == "gzip":
+        # No file name and time stamp in the header: the same pws give the same gzip file
+        return gzip.GzipFile(filename="", mode="wb", fileobj=fdw, mtime=0, **codecs["gzip"][3])
+    
+    return codecs[compress][0].open(fdw, "wb", **codecs[compress][3])
+
+
+
+def compress_stream(pipefdr, pipefdw, ofl):
+
+    """
+    Compressor process: Compressing the pws read from the pipe pipefdr into the outpwfile.
+    """
+
+    # Otherwise the pipe never reaches its end
+    os.close(pipefdw)
+    fdrpipe= open(pipefdr, "rb", buffering=blocksize)
+    fdwofl= open_outpwfile(ofl)
+    try:
+        fdwcodec= compress_outfile(fdwofl)
+        shutil.copyfileobj(fdrpipe, fdwcodec, blocksize)
+        fdwcodec.close()
+        fdwofl.close()
+    except BrokenPipeError:
+        # The reader of the outpwfile has gone: exit code 2 tells the generation
+        if not fdwofl.closed:
+            os.dup2(os.open(os.devnull, os.O_WRONLY), fdwofl.fileno())
+        sys.exit(2)
+    fdrpipe.close()
+
+
+
+def start_compressor(ofl):
+
+    """
+    Starting the compressor process for the outpwfile, thus the compression runs in parallel to the generation. 
+    Returning the buffered binary pipe to write the pws to and the process.
+    """
+
+    (pipefdr, pipefdw)= os.pipe()
+    progress["workers"]= True
+    compressor= multiprocessing.get_context("fork").Process(target=compress_stream, args=(pipefdr, pipefdw, ofl))
+    compressor.start()
+    os.close(pipefdr)
+    
+    return (open(pipefdw, "wb", buffering=blocksize), compressor)
+
+
+
+def append_shard(wflshard, fdw):
+
+    """
+    Appending a shard file to the open binary outfile fdw and deleting it. The bytes get copied in kernel space, 
+    by os.copy_file_range to a file, by os.sendfile to a pipe, where available. 
+    """
+
+    fdw.flush()
+    fdrshard= open(wflshard, "rb")
+    size= os.fstat(fdrshard.fileno()).st_size
+    offset= 0
+    try:
+        tofile= stat.S_ISREG(os.fstat(fdw.fileno()).st_mode)
+        while offset < size:
+            if tofile == True:
+                copied= os.copy_file_range(fdrshard.fileno(), fdw.fileno(), size -offset, offset)
+            else:
+                copied= os.sendfile(fdw.fileno(), fdrshard.fileno(), offset, size -offset)
+            if copied == 0:
+                break
+            offset= offset +copied
+    except BrokenPipeError:
+        fdrshard.close()
+        raise
+    except (AttributeError, OSError):
+        # No kernel space copy (platform or file system): copy in user space
+        fdrshard.seek(offset)
+        shutil.copyfileobj(fdrshard, fdw, blocksize)
+    fdrshard.close()
+    os.remove(wflshard)
+
+
+
+def prod_logfreqs(cpattlist, prodlists, stats):
+
+    """
+    Returning the log relative frequencies of the selected cpatt, let, num and spec substrings (by category), in the order of their lists,
+    from the analysis stats (the dict of the sorted counts and relative cumulated frequencies by category, see category_stats).
+    The selected substrings are the first ones of the sorted counts of their category.
+    """
+
+    logfreqs= {}
+    for category in categories:
+        (sorted02, cumfreq03)= stats[category]
+        nselect= len(cpattlist) if category == "cpatt" else len(prodlists[category])
+        logfreqs[category]= np.log(sorted02['count'][:nselect] /np.sum(sorted02['count'])).tolist()
+    
+    return logfreqs
+
+
+
+def gen_best_first(cpattlist, prodlists, logfreqs):
+
+    """
+    Best-first generation engine:
+    The estimated probability of a new pw is the relative frequency of its condensed pattern times the relative frequencies of its slot substrings.
+    The substring lists are sorted descending by frequency, thus every pattern spans a product lattice, whose probability 
+    descends along every loop dimension. A heap merges the lattices of all patterns: Every popped lattice point pushes 
+    its successors, each point having exactly one predecessor (incrementing the loop dimensions from the last incremented one on).
+    Yielding the new pws in descending probability in chunks of newline terminated lines.
+    """
+
+    lattices= []
+    heap= []
+    for pattidx, cpatt in enumerate(cpattlist):
+        (dims, slotdims)= pattern_dims(cpatt)
+        dimlists= [prodlists[category] for category in dims]
+        dimlogs= [logfreqs[category] for category in dims]
+        # Number of slots filled by every loop dimension
+        dimslots= [slotdims.count(dim) for dim in range(0, len(dims))]
+        lattices.append((dimlists, slotdims, dimlogs, dimslots))
+        if min(len(dimlist) for dimlist in dimlists) > 0:
+            logprob= logfreqs["cpatt"][pattidx] +sum(dimslots[dim] *dimlogs[dim][0] for dim in range(0, len(dims)))
+            heap.append((-logprob, pattidx, (0,) *len(dims)))
+    heapq.heapify(heap)
+    
+    lines= []
+    while heap:
+        (neglogprob, pattidx, point)= heapq.heappop(heap)
+        (dimlists, slotdims, dimlogs, dimslots)= lattices[pattidx]
+        lines.append(b"".join([dimlists[dim][point[dim]] for dim in slotdims]))
+        if len(lines) == 65536:
+            yield b"\n".join(lines) +b"\n"
+            lines= []
+        
+        lastdim= 0
+        for dim in range(0, len(point)):
+            if point[dim] > 0:
+                lastdim= dim
+        for dim in range(lastdim, len(point)):
+            if point[dim] +1 < len(dimlists[dim]):
+                nextpoint= point[:dim] +(point[dim] +1,) +point[dim+1:]
+                nextneglogprob= neglogprob -dimslots[dim] *(dimlogs[dim][point[dim] +1] -dimlogs[dim][point[dim]])
+                heapq.heappush(heap, (nextneglogprob, pattidx, nextpoint))
+    
+    if lines:
+        yield b"\n".join(lines) +b"\n"
+
+
+
+def gen_sample(cpattlist, prodlists, nsample, logfreqs=None):
+
+    """
+    Sampling engine: 
+    Drawing nsample new pws (with replacement) out of the product space without enumerating it, at O(nsample) cost:
+    First the pattern, then the substring of every loop dimension, vectorized in batches.
+    uniform: Uniform over the global candidate indexes (the same distribution as unrank of uniform indexes), 
+    the pattern by its number of pws, the substrings uniformly.
+    weighted: By the estimated probability of the best-first generation, by the log relative frequencies logfreqs (see prod_logfreqs): 
+    the pattern by the sum of the estimated probabilities of its pws (its relative frequency times, by loop dimension, the sum of the relative frequencies 
+    of the selected substrings to the power of the number of its slots), then the substring of every loop dimension by its relative frequency (to that power).
+    Yielding the new pws in chunks of newline terminated lines.
+    """
+
+    rng= np.random.default_rng(seed)
+    sizes= pattern_sizes(cpattlist, prodlists)
+    # Cumulated substring distributions by category and number of slots, relative to the most frequent substring against underflow, 
+    # and the log of the sum of the substring weights
+    dimcdfs= {}
+    dimlogsums= {}
+    if sample_mode == "weighted":
+        logweights= []
+        for pattidx in range(0, len(cpattlist)):
+            # Patterns without pws get no weight
+            if sizes[pattidx][0] == 0:
+                logweights.append(-math.inf)
+                continue
+            (dims, slotdims)= pattern_dims(cpattlist[pattidx])
+            logweight= logfreqs["cpatt"][pattidx]
+            for dim in range(0, len(dims)):
+                key= (dims[dim], slotdims.count(dim))
+                if key not in dimcdfs:
+                    logs= np.array(logfreqs[dims[dim]][:len(prodlists[dims[dim]])])
+                    weights= np.exp(key[1] *(logs -logs[0]))
+                    dimcdfs[key]= np.cumsum(weights) /np.sum(weights)
+                    dimlogsums[key]= key[1] *logs[0] +math.log(np.sum(weights))
+                logweight= logweight +dimlogsums[key]
+            logweights.append(logweight)
+        logweights= np.array(logweights)
+        pattweights= np.exp(logweights -np.max(logweights)) if len(cpattlist) > 0 and np.max(logweights) > -math.inf else np.zeros(len(cpattlist))
+    else:
+        pattweights= np.array([float(size[0]) for size in sizes])
+    if len(cpattlist) == 0 or np.sum(pattweights) == 0:
+        return
+    pattcdf= np.cumsum(pattweights) /np.sum(pattweights)
+    
+    for start in range(0, nsample, 65536):
+        n= min(start +65536, nsample) -start
+        pattidxs= np.minimum(np.searchsorted(pattcdf, rng.random(n), side="right"), len(cpattlist) -1)
+        lines= [b""] *n
+        for pattidx in np.unique(pattidxs).tolist():
+            where= np.flatnonzero(pattidxs == pattidx).tolist()
+            (dims, slotdims)= pattern_dims(cpattlist[pattidx])
+            dimlists= [prodlists[category] for category in dims]
+            draws= []
+            for dim in range(0, len(dims)):
+                if sample_mode == "weighted":
+                    key= (dims[dim], slotdims.count(dim))
+                    draws.append(np.minimum(np.searchsorted(dimcdfs[key], rng.random(len(where)), side="right"), len(dimlists[dim]) -1).tolist())
+                else:
+                    draws.append(rng.integers(0, len(dimlists[dim]), len(where)).tolist())
+            for k in range(0, len(where)):
+                lines[where[k]]= b"".join([dimlists[dim][draws[dim][k]] for dim in slotdims])
+        yield b"\n".join(lines) +b"\n"
+
+
+
+def bloom_size(expected):
+
+    """
+    Returning the number of bits and of hashes of the Bloom filter of seen_filter for the expected number of pws 
+    at the false positive rate --dedup-fpr, within the memory limit --dedup-memory, its false positive rate at the expected number of pws, 
+    (1 - e^(-k *n /m))^k, above --dedup-fpr if the memory limit cuts it, and the number of bits it needs for --dedup-fpr.
+    """
+
+    expected= max(expected, 1)
+    # The integer number of hashes of the optimum and the bits, that reach --dedup-fpr with them
+    nhashes= max(math.ceil(-math.log2(dedup_fpr)), 1)
+    needed= math.ceil(-nhashes *expected /math.log(1.0 -dedup_fpr **(1.0 /nhashes))) +64
+    nbits= max(min(needed, dedup_memory *8), 64)
+    if nbits < needed:
+        nhashes= max(int(round(nbits /expected *math.log(2))), 1)
+    
+    return (nbits, nhashes, (1.0 -math.exp(-nhashes *expected /nbits)) **nhashes, needed)
+
+
+
+def seen_filter(seen, lines, add):
+
+    """
+    Returning the lines, that are not in the seen pws seen, in their order. With add they get added to seen.
+    seen is an exact set up to the memory limit --dedup-memory, then a Bloom filter for the expected number of pws 
+    (see bloom_size): Its k bit positions of a pw are derived from the 64 bit hash h of the pw by double hashing, h + i *h2.
+    """
+
+    if seen["bloom"] is None:
+        newlines= [line for line in lines if line not in seen["set"]]
+        if add == True:
+            seen["set"].update(newlines)
+            seen["bytes"]= seen["bytes"] +sum(len(line) for line in newlines) +setentrybytes *len(newlines)
+            if seen["bytes"] > dedup_memory:
+                # Switch to the Bloom filter: sized for the expected pws, but within the memory limit
+                (nbits, nhashes, rate, needed)= bloom_size(max(seen["expected"], len(seen["set"])))
+                seen["nbits"]= np.uint64(nbits)
+                seen["nhashes"]= nhashes
+                seen["bloom"]= np.zeros((nbits +7) //8, dtype=np.uint8)
+                print("")
+                print("The dedup set has reached the memory limit, switching to a Bloom filter of " +str(round(nbits /8000000, 1)) +" MB with " +str(nhashes) 
+                      +" hashes (false positive rate " +str(round(rate, 6)) +").")
+                if nbits < needed:
+                    print("")
+                    print("WARNING: The memory limit --dedup-memory cuts the Bloom filter: About " +str(round(rate *100, 2)) +" % of the new pws get dropped "
+                          +"as false duplicates, instead of --dedup-fpr " +str(dedup_fpr) +".")
+                known= list(seen["set"])
+                seen["set"]= set()
+                for start in range(0, len(known), 65536):
+                    seen_filter(seen, known[start:start +65536], True)
+        return newlines
+    
+    if len(lines) == 0:
+        return lines
+    hashes= np.fromiter(map(hash, lines), dtype=np.int64, count=len(lines)).view(np.uint64)
+    hashes2= (hashes *np.uint64(0x9E3779B97F4A7C15)) | np.uint64(1)
+    positions= (hashes[None, :] +np.arange(seen["nhashes"], dtype=np.uint64)[:, None] *hashes2[None, :]) %seen["nbits"]
+    bytepositions= (positions >> np.uint64(3)).astype(np.int64)
+    bitmasks= (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8))
+    isnew= np.any((seen["bloom"][bytepositions] & bitmasks) == 0, axis=0)
+    if add == True:
+        np.bitwise_or.at(seen["bloom"], bytepositions[:, isnew].ravel(), bitmasks[:, isnew].ravel())
+    
+    return [line for (line, new) in zip(lines, isnew.tolist()) if new]
+
+
+
+def file_chunks(fl):
+
+    """
+    Opening the plain or compressed inpwfile fl for reading in newline aligned chunks.
+    Returning the open binary file and the iterator of its chunks.
+    """
+
+    codec= inpwfile_codec(fl)
+    if codec == "none":
+        fdr= open(fl, "rb")
+        return (fdr, mmap_chunks(fdr, 0, os.path.getsize(fl)))
+    
+    fdr= codecs[codec][0].open(fl, "rb")
+    return (fdr, block_chunks(prefetch_blocks(fdr)))
+
+
+
+def dedup_inpwfiles():
+
+    """
+    Returning the inpwfiles, whose pws --exclude-input removes. The analysis stores among them have no pwlines to exclude.
+    """
+
+    return [fl for fl in ifls if not fl.endswith(".npz")] if exclude_input == True else []
+
+
+
+def dedup_expected(expected):
+
+    """
+    Returning the number of pws to expect in the seen pws of dedup_chunks: the expected new pws and the counted pwlines of the inpwfiles (--exclude-input).
+    Raising ValueError, if they do not fit into the exact set and the memory limit cuts the Bloom filter above --dedup-fpr (see bloom_size), 
+    thus before the outpwfile gets opened.
+    """
+
+    # The Bloom filter may replace the exact set while loading the inpwfiles: it gets sized for all of their pwlines
+    for fl in dedup_inpwfiles():
+        (fdrifl, inchunks)= file_chunks(fl)
+        for chunk in inchunks:
+            expected= expected +chunk.count(b"\n") +1
+        fdrifl.close()
+    
+    (nbits, nhashes, rate, needed)= bloom_size(expected)
+    if expected *setentrybytes > dedup_memory and nbits < needed:
+        raise ValueError("The Bloom filter of " +str(expected) +" pws within --dedup-memory " +str(dedup_memory /1000000) +" MB has a false positive rate of " 
+                         +str(round(rate, 6)) +", above --dedup-fpr " +str(dedup_fpr) +". It needs " +str(math.ceil(needed /800000) /10) +" MB.")
+    
+    return expected
+
+
+
+def dedup_chunks(chunks, expected):
+
+    """
+    Passing through the chunks of newline terminated lines, without the duplicates of earlier lines (--dedup) 
+    and without the pws of the inpwfiles (--exclude-input), in bounded memory (see seen_filter).
+    expected is the number of pws to expect in the seen pws, for the sizing of the Bloom filter (see dedup_expected).
+    """
+
+    seen= {"set": set(), "bytes": 0, "bloom": None, "expected": expected, "dropped": 0, "excluded": 0}
+    
+    for fl in dedup_inpwfiles():
+        (fdrifl, inchunks)= file_chunks(fl)
+        for chunk in inchunks:
+            seen_filter(seen, list(dict.fromkeys(chunk.split(b"\n"))), True)
+        fdrifl.close()
+    
+    # Filtering batches of at least 65536 lines, the chunks of the generation engine may be small
+    lines= []
+    for chunk in itertools.chain(chunks, [None]):
+        if chunk is not None:
+            lines.extend(chunk.split(b"\n")[:-1])
+            if len(lines) < 65536:
+                continue
+        if dedup == True:
+            newlines= seen_filter(seen, list(dict.fromkeys(lines)), True)
+        else:
+            newlines= seen_filter(seen, lines, False)
+        seen["dropped"]= seen["dropped"] +len(lines) -len(newlines)
+        lines= []
+        if newlines:
+            yield b"\n".join(newlines) +b"\n"
+    
+    print("")
+    print("")
+    print("Removed " +str(seen["dropped"]) +" pws (duplicates" +(" and pws of the inpwfile" if exclude_input == True else "") +").")
+
+
+
+def limit_chunks(chunks, top):
+
+    """
+    Passing through the chunks of newline terminated lines up to the first top lines.
+    """
+
+    remaining= top
+    for chunk in chunks:
+        nlines= chunk.count(b"\n")
+        if nlines >= remaining:
+            if remaining > 0:
+                cut= 0
+                for i in range(0, remaining):
+                    cut= chunk.index(b"\n", cut) +1
+                yield chunk[:cut]
+            return
+        remaining= remaining -nlines
+        yield chunk
+
+
+
+def pattern_sizes(cpattlist, prodlists):
+
+    """
+    Exact forecast of the number of pws to generate and of their bytes (incl. the newlines) by pattern, without generating them:
+    The number of pws of a pattern is the product of its loop dimension sizes, 
+    every slot contributes the total length of its substrings times the number of pws per substring.
+    Returning the list of the (count, bytes) tuples of the patterns.
+    """
+
+    lens= {category: len(prodlists[category]) for category in prodlists}
+    sumlens= {category: sum(len(token) for token in prodlists[category]) for category in prodlists}
+    
+    return dims_sizes(cpattlist, lens, sumlens)
+
+
+
+def dims_sizes(cpattlist, lens, sumlens):
+
+    """
+    Forecast by pattern (see pattern_sizes) from the numbers lens and the total lengths sumlens of the selected substrings by category.
+    Returning the list of the (count, bytes) tuples of the patterns.
+    """
+
+    sizes= []
+    for cpatt in cpattlist:
+        (dims, slotdims)= pattern_dims(cpatt)
+        pattcount= math.prod(lens[category] for category in dims)
+        if pattcount > 0:
+            sizes.append((pattcount, pattcount +sum(pattcount //lens[dims[dim]] *sumlens[dims[dim]] for dim in slotdims)))
+        else:
+            sizes.append((0, 0))
     
+    return sizes
 
-def select_spec():
+
+
+def forecast(cpattlist, prodlists):
 
     """
-    Reading the workfile "spec.dic" and computing the relative frequencies.
-    Selecting the spec strings up to critical p_value. 
-    Writing the workfile "specprod.dic".
+    Exact forecast of the number of pws to generate and of their bytes (incl. the newlines), without generating them.
+    Returning the tuple (count, bytes).
     """
 
-    global pval_spec
-    global count_spec
+    sizes= pattern_sizes(cpattlist, prodlists)
+    
+    return (sum(size[0] for size in sizes), sum(size[1] for size in sizes))
 
-    if mode_interactive == True:
-        
-        print("")
-        print("")
-        print("Step [2d] Select special character substrings by p-value")
-        print("")    
-        print("High p-values select many outcomes, thus create many pws in the end.")
-        print("But if the p-value is too high, your machine will run into an 'endless' pw generation job.")
-        print("Watch the length of the final result array, that will be printed subsequently.")    
-        while True:
-            print("")
-            print("Set p-value input loop. Press 'Enter' to proceed without any changes.")
-            print("")
-            print("The current p-value for the special character substrings is:   " + str(pval_spec))           
-            inputvalue= input("New p-value (between 0.00 and 1.00)?: ")
-            if inputvalue== "":
-                break
-            else:
-                try:
-                    pval_spec= float(inputvalue)
-                except ValueError:
-                    print("")
-                    print("")
-                    print("ERROR: wrong input.")
-        try:
-            os.system("clear")
-        except:
-            pass
-                    
 
-    print("")
-    print("")
-    print("Processing the special character substrings ...")  
 
+def split_patterns(cpattlist, prodlists, jobs):
 
-    spec00= np.array(np.loadtxt(wflspec, dtype="S32", delimiter=None ) )
-    # print("")
-    # print("\nspec00:")
-    # print(spec00)
-    # print(spec00.shape)
-    
+    """
+    Splitting the generation into jobs contiguous parts of about equal forecast bytes, in pattern order.
+    A large pattern gets split along its first (outermost) loop dimension.
+    Returning the list of the parts, each a list of (pattern index, start, end) slices of the first loop dimension.
+    """
+
+    sizes= pattern_sizes(cpattlist, prodlists)
+    total= sum(size[1] for size in sizes)
+    tokenlens= {category: np.array([len(token) for token in prodlists[category]], dtype=np.int64) for category in prodlists}
+    parts= [[] for part in range(0, jobs)]
+    done= 0
+    
+    for pattidx, cpatt in enumerate(cpattlist):
+        (pattcount, pattbytes)= sizes[pattidx]
+        if pattcount == 0:
+            continue
+        (dims, slotdims)= pattern_dims(cpatt)
+        firstlens= tokenlens[dims[0]]
+        # Bytes of the pws of every item of the first loop dimension: a common part plus its substring length in its slots
+        itemcount= pattcount //firstlens.shape[0]
+        firstslots= slotdims.count(0)
+        itembytes= (pattbytes -itemcount *firstslots *int(np.sum(firstlens))) //firstlens.shape[0] +itemcount *firstslots *firstlens
+        cumbytes= done +np.cumsum(itembytes)
+        start= 0
+        while start < firstlens.shape[0]:
+            part= min(done *jobs //total, jobs -1)
+            if part == jobs -1:
+                end= firstlens.shape[0]
+            else:
+                # First item reaching the byte boundary of the part
+                end= int(np.searchsorted(cumbytes, (part +1) *total /jobs, side="left")) +1
+                end= min(max(end, start +1), firstlens.shape[0])
+            parts[part].append((pattidx, start, end))
+            done= int(cumbytes[end -1])
+            start= end
     
-    spec00uniq= np.unique(spec00, return_counts=True)
-    # print("")
-    # print("\nspec00uniq:")
-    # print(spec00uniq)
-    # # print(spec00uniq.shape)
+    return [part for part in parts if part]
+
+
+
+def budget_model():
+
+    """
+    Returning the model of the budget solver from the analysis: 
+    By category, the p-values of the grid 0.00, 0.01, ..., 1.00, that select a new number of outcomes, those numbers, their covered mass and their total length.
+    The patterns in groups of the same numbers of loop dimensions and slots by category let, num, spec (their estimates differ by the pattern frequency only): 
+    those numbers, and by cpatt grid step the number of the selected patterns and their summed relative frequency by group.
+    """
+
+    grid= np.linspace(0.0, 1.0, 101)
+    steps= {}
+    for category, wfl in zip(categories, (wflcpatt, wfllet, wflnum, wflspec)):
+        (sorted02, cumfreq03)= category_stats(category, wfl)
+        nselect= np.minimum(np.searchsorted(cumfreq03, grid, side="left") +1, cumfreq03.shape[0])
+        (nselect, first)= np.unique(nselect, return_index=True)
+        covered= np.concatenate(([0.0], cumfreq03))[nselect]
+        cumlen= sorted02['offsets'][nselect]
+        steps[category]= (grid[first], nselect, covered, cumlen)
     
+    (sorted02, cumfreq03)= category_stats("cpatt", wflcpatt)
+    freq= sorted02['count'] /max(np.sum(sorted02['count']), 1)
+    exps= np.zeros((sorted02['count'].shape[0], 6))
+    for i, cpatt in enumerate(store_tokens(sorted02)):
+        (dims, slotdims)= pattern_dims(cpatt)
+        for k, category in enumerate(("let", "num", "spec")):
+            exps[i, k]= dims.count(category)
+            exps[i, 3 +k]= [dims[dim] for dim in slotdims].count(category)
+    (groups, inverse)= np.unique(exps, axis=0, return_inverse=True)
+    inverse= inverse.reshape(-1)
+    mult= np.array([np.bincount(inverse[:npatt], minlength=groups.shape[0]) for npatt in steps["cpatt"][1]], dtype=float)
+    freqsum= np.array([np.bincount(inverse[:npatt], weights=freq[:npatt], minlength=groups.shape[0]) for npatt in steps["cpatt"][1]])
     
-    (values, counts)= spec00uniq 
-    spec01=np.array((values[0], counts[0]), dtype=[('value', 'S32'), ('count', 'int32')])
-    for i in range(1, values.shape[0]):
-        tupel= (values[i], counts[i])
-        dtype= dtype=[('value','S32'),('count','int32')]
-        spec01= np.append(spec01, np.array(tupel, dtype= dtype ) )
-    # print("")
-    # print("\nspec01:")
-    # print(spec01)
-    # print(spec01.shape)
+    return (steps, groups[:, :3], groups[:, 3:], mult, freqsum)
+
+
+
+def budget_estimate(model, state):
+
+    """
+    Returning the forecast number of pws, their bytes and the estimated covered input pw mass of a grid state of the budget solver 
+    (the dict of the grid step indexes by category, see budget_model). 
+    The step indexes may be index arrays, then the results are the arrays of their broadcast shape.
+    """
+
+    (steps, groupdims, groupslots, mult, freqsum)= model
+    index= dict(zip(categories, np.broadcast_arrays(*[np.asarray(state[category]) for category in categories])))
+    groupcount= mult[index["cpatt"]]
+    groupmass= freqsum[index["cpatt"]]
+    grouplen= 1.0
+    for k, category in enumerate(("let", "num", "spec")):
+        nsel= steps[category][1][index[category]].astype(float)[..., None]
+        avglen= np.divide(steps[category][3][index[category]][..., None], nsel, out=np.zeros(nsel.shape), where=(nsel > 0))
+        groupcount= groupcount *nsel **groupdims[:, k]
+        groupmass= groupmass *steps[category][2][index[category]][..., None] **groupslots[:, k]
+        grouplen= grouplen +avglen *groupslots[:, k]
     
+    return (np.sum(groupcount, axis=-1), np.sum(groupcount *grouplen, axis=-1), np.sum(groupmass, axis=-1))
+
+
+
+def solve_budget():
+
+    """
+    Budget solver:
+    Searching the p-values of the categories, that cover the most estimated input pw mass, while the forecast 
+    of the pws to generate stays within --max-candidates and --max-bytes.
+    The estimated covered mass of a condensed pattern is its relative frequency times the relative cumulated frequencies 
+    of the selected substrings of its slots (see budget_estimate).
+    Search on the p-value grid 0.00, 0.01, ..., 1.00: For every cpatt p-value, the let, num and spec p-values get fitted 
+    to the budget by coordinate passes over the pairs of these categories, each pass searching all the grid steps of its pair 
+    (thus also lowering them), starting at 0.00 and at the best p-values of the previous cpatt p-value.
+    Setting the p-values of the categories.
+    """
+
+    global pval_cpatt
+    global pval_let
+    global pval_num
+    global pval_spec
     
-    spec02= np.sort(spec01, order='count')
-    spec02= spec02[range((values.shape[0] -1), -1, -1)]
     print("")
-    print("\nspec02:")
-    print(spec02)
-    print(spec02.shape)
-    
-    
-    spec03= np.cumsum(spec02['count']) /np.sum(spec02['count'])
     print("")
-    print("\nspec03:")
-    print(spec03)
-    print(spec03.shape)
+    print("Solving the p-values for the budget of " +str(max_candidates) +" pws / " +str(max_bytes) +" bytes ...")
     
-       
-    spec04= spec03[spec03 < pval_spec] 
-    # print("")
-    # print("\nspec04:")
-    # print(spec04)
-    # print(spec04.shape)
+    model= budget_model()
+    (steps, groupdims, groupslots, mult, freqsum)= model
+    pairs= (("let", "num"), ("let", "spec"), ("num", "spec"))
     
+    def share(count, nbytes):
+        # Used budget share
+        return np.maximum(count /max_candidates if max_candidates is not None else 0.0, nbytes /max_bytes if max_bytes is not None else 0.0)
     
-    spec05= spec02[0: spec04.shape[0]+1]['value']
-    # print("")
-    # print("\nspec05:")
-    # print(spec05)
-    # print(spec05.shape)
+    best= None
+    for cpattstep in range(0, steps["cpatt"][0].shape[0]):
+        # More patterns only add pws
+        if share(*budget_estimate(model, {"cpatt": cpattstep, "let": 0, "num": 0, "spec": 0})[:2]) > 1.0:
+            break
+        # The groups of the selected patterns only
+        active= mult[cpattstep] > 0
+        stepmodel= (steps, groupdims[active], groupslots[active], mult[:, active], freqsum[:, active])
+        
+        starts= [{"cpatt": cpattstep, "let": 0, "num": 0, "spec": 0}]
+        if best is not None:
+            starts.append(dict(best[0], cpatt=cpattstep))
+        for state in starts:
+            (count, nbytes, mass)= budget_estimate(stepmodel, state)
+            if share(count, nbytes) > 1.0:
+                continue
+            improved= True
+            while improved == True:
+                improved= False
+                for (category1, category2) in pairs:
+                    trial= dict(state)
+                    trial[category1]= np.arange(0, steps[category1][0].shape[0])[:, None]
+                    trial[category2]= np.arange(0, steps[category2][0].shape[0])[None, :]
+                    (trialcounts, trialbytes, trialmasses)= budget_estimate(stepmodel, trial)
+                    trialmasses= np.where(share(trialcounts, trialbytes) <= 1.0, trialmasses, -1.0)
+                    (k1, k2)= np.unravel_index(np.argmax(trialmasses), trialmasses.shape)
+                    if trialmasses[k1, k2] > mass +1e-12:
+                        (state[category1], state[category2])= (int(k1), int(k2))
+                        (count, nbytes, mass)= (trialcounts[k1, k2], trialbytes[k1, k2], trialmasses[k1, k2])
+                        improved= True
+            if best is None or mass > best[3]:
+                best= (dict(state), count, nbytes, mass)
+    
+    if best is None:
+        print("")
+        print("WARNING: Even the smallest selection exceeds the budget.")
+        state= {category: 0 for category in categories}
+        (count, nbytes, mass)= budget_estimate(model, state)
+    else:
+        (state, count, nbytes, mass)= best
     
+    pval_cpatt= float(steps["cpatt"][0][state["cpatt"]])
+    pval_let= float(steps["let"][0][state["let"]])
+    pval_num= float(steps["num"][0][state["num"]])
+    pval_spec= float(steps["spec"][0][state["spec"]])
     
-    spec= np.array(spec05, dtype="S32")
-    count_spec= float(spec.shape[0])
-    np.savetxt(wflspecprod, spec, fmt="%s")
-    print("")
-    print("\nspec:")
-    print(spec)
-    print(spec.shape)
     print("")
-    print("@ pval_let:   " + str(pval_let))
+    print("p-values:   cpatt " +str(round(pval_cpatt, 2)) +"   let " +str(round(pval_let, 2)) +"   num " +str(round(pval_num, 2)) +"   spec " +str(round(pval_spec, 2)))
+    print("Estimated covered input pw mass:   " +str(round(float(mass), 4)))
+    print("Forecast:   " +str(int(count)) +" pws / " +str(int(nbytes)) +" bytes")
     print("")
     print("")
-    print("Ready. Step [2d] 'Selecting the special characters substrings' has been completed.")    
+    print("Ready. The budget solver has been completed.")
+
 
 
+def pw_chunks(cpattlist, prodlists, state=None, logfreqs=None):
+
+    """
+    Returning the iterator of the chunks of newline terminated new pws of the serial generation, 
+    following --sample, --order and the candidate indexes [state["next"], state["end"]) (if indexed), 
+    without duplicates and pws of the inpwfiles (--dedup, --exclude-input) and limited to --top.
+    Raising ValueError already here, if the Bloom filter of --dedup cannot reach --dedup-fpr (see dedup_expected).
+    --order probability and --sample-mode weighted take the log relative frequencies logfreqs (see prod_logfreqs).
+    """
+
+    if sample is not None:
+        chunks= gen_sample(cpattlist, prodlists, sample, logfreqs)
+    elif order == "probability":
+        chunks= gen_best_first(cpattlist, prodlists, logfreqs)
+    elif indexed == True:
+        chunks= gen_range(cpattlist, prodlists, state["next"], state["end"])
+    else:
+        chunks= gen_chunks(cpattlist, prodlists)
+    if dedup == True or exclude_input == True:
+        chunks= dedup_chunks(chunks, dedup_expected(sample if sample is not None else forecast(cpattlist, prodlists)[0]))
+    if top is not None:
+        chunks= limit_chunks(chunks, top)
     
-def gen_pws(ofl=ofl):
+    return chunks
+
+
+
+def gen_pws():
 
 
     """
@@ -717,54 +2812,55 @@ def gen_pws(ofl=ofl):
     Wanna proceed break point to avoid endless generation job.  
     """
 
-
-    global count_let
-    global count_num
-    global count_spec
-    
         
     try:
-        sum= 0.0
-        fdrcpattprod= open(wflcpattprod, "r")  
-        for cpattline in fdrcpattprod:
-            prod= 1.0
-            cpattlen= len(cpattline[2:-2])
-            for i in range (0, cpattlen):
-                cpattsymbol= cpattline[2:-2][i]
-                # print(cpattsymbol) 
-                if cpattsymbol== "A":
-                    prod= prod * count_let    
-                elif cpattsymbol== "1":
-                    prod= prod * count_num
-                elif cpattsymbol== "$":
-                    fdwofl.write(specline[2:-2])
-                    prod= prod * count_spec    
-                sum= sum +prod
+        (cpattlist, prodlists)= prod_lists()
+        
+        (sum_int, sum_bytes)= forecast(cpattlist, prodlists)
         
-        sum_int= int(sum)   
         print("")
         print("")
-        print("The size forecast for the number of pws to generate is:")
+        print("The size forecast for the number of pws to generate (" +slots +" slots) is:")
         print("")
         print(sum_int)
         print("")
-        print("(That might be " + str(sum_int *15 /1000000) +" MB.)")
+        print("(That is " + str(sum_bytes /1000000) +" MB.)")
+        if compress != "none":
+            print("")
+            print("(Before the " +compress +" compression.)")
+        if top is not None and top < sum_int:
+            print("")
+            print("Limited to the top " +str(top) +" pws (in " +order +" order).")
+        if sample is not None:
+            print("")
+            print("Sampling " +str(sample) +" pws (" +sample_mode +", with replacement) instead.")
+        if dedup == True or exclude_input == True:
+            print("")
+            print("Duplicates" +(" and pws of the inpwfile" if exclude_input == True else "") +" get removed, the forecast is an upper bound.")
+        if indexed == True:
+            (start, end)= index_range(sum_int)
+            print("")
+            print("Limited to the candidate indexes [" +str(start) +", " +str(end) +") (shard " +str(shard_k) +"/" +str(shard_n) +"), that is " +str(end -start) +" pws.")
     
-    except:
+    except (OSError, ValueError, SyntaxError):
         print("")
         print("")
-        print("The size forecast cannot be computed, because one of the previous steps has not been run fresh before.")
+        print("The size forecast cannot be computed, because one of the previous steps has not been run before.")
         print("")
-     
         
+     
     print("")
-    prlinput= input("Do you want to proceed? (y/ n/ Crtl-c):")
-    if prlinput != "y":
-        exit()
+    if ofl == "-" and stdoutatty == False:
+        # Nobody to answer at the end of a pipe
+        print("Streaming the pws to the stdout ...")
+    else:
+        prlinput= input("Do you want to proceed? (y/ n/ Crtl-c):")
+        if prlinput != "y":
+            exit()
     
 
     """
-    Reading the workfiles "cpattprod.dic", "letprod.dic", "numprod.dic" and "specprod.dic"
+    Taking the selected substrings of the steps [2a] - [2d] (or reading the workfiles "cpattprod.dic", "letprod.dic", "numprod.dic" and "specprod.dic")
     Concatenating the new pws in nested loops straight following the condensed pw construction pattern "cpattprod.dic"
     No configuration here. The selection config is performed in the previous steps. 
     Writing the final outfile "pwsgenerated.dic".
@@ -775,83 +2871,152 @@ def gen_pws(ofl=ofl):
     print("")
     print("Generating pws ...")
   
-           
-    fdrchrprod= open(wflletprod, "r")
-    fdrnumprod= open(wflnumprod, "r")
-    fdrspecprod= open(wflspecprod, "r")
-    chrlinelist= fdrchrprod.readlines()
-    numlinelist= fdrnumprod.readlines()    
-    speclinelist= fdrspecprod.readlines()            
-    fdrchrprod.close()
-    fdrnumprod.close()
-    fdrspecprod.close()
-    
-    
-    fdwofl = open(ofl, "w")
-    fdrcpattprod= open(wflcpattprod, "r")         
-    for cpattline in fdrcpattprod:
-        # print(cpattline)
-        haschr= False
-        hasnum= False 
-        hasspec= False
-        if cpattline.find("A")!= -1:
-            haschr= True
-        if cpattline.find("1")!= -1:
-            hasnum= True
-        if cpattline.find("$")!= -1:
-            hasspec= True
-                
-        fdrchrprod = open(wflletprod, "r")
-        chrline= fdrchrprod.readline()
-        while chrline in chrlinelist:
-            # print(chrline)
-            fdrnumprod = open(wflnumprod, "r")
-            numline= fdrnumprod.readline()       
-            while numline in numlinelist:
-                # print(numline)
-                fdrspecprod = open(wflspecprod, "r")
-                specline= fdrspecprod.readline()
-                while specline in speclinelist:
-                    # print(specline)
-                    cpattlen= len(cpattline[2:-2])
-                    for i in range (0, cpattlen):
-                        cpattsymbol= cpattline[2:-2][i]
-                        # print(cpattsymbol) 
-                        if cpattsymbol== "A":
-                            fdwofl.write(chrline[2:-2])
-                        elif cpattsymbol== "1":
-                            fdwofl.write(numline[2:-2])
-                        elif cpattsymbol== "$":
-                            fdwofl.write(specline[2:-2])
-                    fdwofl.write("\n")
-                    
-                    if hasspec== False:
-                        break          
-                    try:
-                        specline= next(fdrspecprod)
-                    except:
-                        specline= chr(2)
-                        fdrspecprod.close()
     
-                if hasnum== False:
-                    break
-                try:
-                    numline= next(fdrnumprod)
-                except:
-                    numline= chr(2)
-                    fdrnumprod.close()
+    (cpattlist, prodlists)= prod_lists()
+    progress_start("gen_pws", "pws")
+    
+    # A stream (stdout, named pipe) can neither take the first shard by renaming nor be appended in place
+    tofile= ofl != "-" and (not os.path.exists(ofl) or os.path.isfile(ofl))
+    
+    if indexed == True:
+        (start, end)= index_range(forecast(cpattlist, prodlists)[0])
+        state= {"start": start, "end": end, "next": start, "bytes": 0, "selection": selection_hash(cpattlist, prodlists)}
+        if resume == True and os.path.exists(checkpoint):
+            fdr= open(checkpoint, "r")
+            state= json.load(fdr)
+            fdr.close()
+            if state["selection"] != selection_hash(cpattlist, prodlists):
+                print("")
+                print("ERROR: The checkpoint   " +checkpoint +"   belongs to another selection of patterns and substrings.")
+                sys.exit(1)
+            print("")
+            print("Resuming the candidate indexes [" +str(state["start"]) +", " +str(state["end"]) +") at " +str(state["next"]) +".")
+        if gen_jobs > 1:
+            print("")
+            print("The candidate index range gets generated by one process, use --shard k/N for several ones.")
+    elif gen_jobs > 1:
+        serialopts= [name for (name, used) in (("--top", top is not None), ("--order probability", order != "pattern"), ("--sample", sample is not None), 
+                                               ("--dedup", dedup == True), ("--exclude-input", exclude_input == True)) if used]
+        if serialopts:
+            print("")
+            print("With " +", ".join(serialopts) +" the pws get generated by one process, --gen-jobs does not apply.")
+    
+    # The ETA follows the exact forecast, with --dedup and --exclude-input it is an upper bound
+    if sample is not None:
+        gentotal= sample
+    elif indexed == True:
+        gentotal= state["end"] -state["next"]
+    else:
+        gentotal= forecast(cpattlist, prodlists)[0]
+    if top is not None:
+        gentotal= min(gentotal, top)
+    progress_total(gentotal)
+    
+    pool= None
+    wflshards= []
+    compressor= None
+    fdwofl= None
+    try:
+        # Parallel generation: contiguous parts in pattern order, thus the merged shards are identical to the serial generation
+        if gen_jobs > 1 and order == "pattern" and top is None and indexed == False and sample is None and dedup == False and exclude_input == False:
+            parts= split_patterns(cpattlist, prodlists, gen_jobs)
+            if tofile == True:
+                wflshards= [ofl +".part" +str(k) for k in range(0, len(parts))]
+            else:
+                wflshards= [workdir +"/" +"pwsgenerated.part" +str(k) for k in range(0, len(parts))]
+            print("")
+            print("Using " +str(len(parts)) +" worker processes.")
+            # Forked workers share the selected substrings in memory
+            progress["workers"]= True
+            pool= multiprocessing.get_context("fork").Pool(max(len(parts), 1))
+            results= [pool.apply_async(gen_shard, (pattslices, wflshard)) for (pattslices, wflshard) in zip(parts, wflshards)]
+            pool.close()
             
-            if haschr== False:
-                break
-            try:
-                chrline= next(fdrchrprod)
-            except:
-                chrline= chr(2)
-                fdrchrprod.close()
-    
-    fdrcpattprod.close()
-    fdwofl.close()           
+            # Merging the shards in order, each as soon as it is ready
+            if tofile == True:
+                open(ofl, "wb").close()
+            for k in range(0, len(parts)):
+                progress_wait(results[k])
+                if tofile == True and k == 0:
+                    os.replace(wflshards[0], ofl)
+                    # copy_file_range does not append to files opened in append mode
+                    fdwofl= open(ofl, "r+b")
+                    fdwofl.seek(0, 2)
+                else:
+                    if fdwofl is None:
+                        fdwofl= open_outpwfile(ofl)
+                    append_shard(wflshards[k], fdwofl)
+            pool.join()
+            if fdwofl is not None:
+                fdwofl.close()
+        
+        else:
+            logfreqs= None
+            if order == "probability" or (sample is not None and sample_mode == "weighted"):
+                stats= {category: category_stats(category, wfl) for category, wfl in zip(categories, (wflcpatt, wfllet, wflnum, wflspec))}
+                logfreqs= prod_logfreqs(cpattlist, prodlists, stats)
+            chunks= pw_chunks(cpattlist, prodlists, state if indexed == True else None, logfreqs)
+            
+            # Buffered writing of the generated chunks in large batches, a full pipe blocks the generation
+            if compress != "none":
+                (fdwofl, compressor)= start_compressor(ofl)
+            elif indexed == True and state["next"] > state["start"] and tofile == True:
+                # Resume: drop the pws written after the checkpoint
+                os.truncate(ofl, state["bytes"])
+                fdwofl= open(ofl, "r+b", buffering=blocksize)
+                fdwofl.seek(0, 2)
+            else:
+                fdwofl = open_outpwfile(ofl)
+            
+            chunks= batch_chunks(chunks)
+            if checkpoint == "":
+                for chunk in chunks:
+                    fdwofl.write(chunk)
+            else:
+                due= time.monotonic() +checkpointinterval
+                for chunk in chunks:
+                    fdwofl.write(chunk)
+                    state["next"]= state["next"] +chunk.count(b"\n")
+                    state["bytes"]= state["bytes"] +len(chunk)
+                    if time.monotonic() >= due:
+                        # The checkpoint must not get ahead of the pws on disk
+                        fdwofl.flush()
+                        if tofile == True:
+                            os.fsync(fdwofl.fileno())
+                        save_checkpoint(state)
+                        due= time.monotonic() +checkpointinterval
+            fdwofl.close()           
+            if checkpoint != "":
+                save_checkpoint(state)
+            if compressor is not None:
+                compressor.join()
+                if compressor.exitcode == 2:
+                    raise BrokenPipeError
+    
+    except BrokenPipeError:
+        # The reader has closed the pipe (e.g. the cracker has finished): stop quietly, the unflushed rest goes to devnull
+        if fdwofl is not None and not fdwofl.closed:
+            os.dup2(os.open(os.devnull, os.O_WRONLY), fdwofl.fileno())
+        if compressor is not None:
+            compressor.join()
+            if compressor.exitcode not in (0, 2):
+                print("")
+                print("The " +compress +" compression of the outpwfile has failed.")
+                sys.exit(1)
+        if pool is not None:
+            pool.terminate()
+            for wflshard in wflshards:
+                if os.path.exists(wflshard):
+                    os.remove(wflshard)
+        progress_end()
+        print("")
+        print("")
+        print("The reader has closed the pipe. The final step [3] 'Generating new pws' has been stopped.")
+        print("")
+        sys.exit(0)
 
+    progress_end()
+    
     print("")
     print("")
     print("Ready. The final step [3] 'Generating new pws' has been completed.")
@@ -859,61 +3024,333 @@ def gen_pws(ofl=ofl):
     print("The <outpwfile> generated is   " +ofl + " .")   
     print("")
 
+
+
+def evaluate_target():
+
+    """
+    Step [3] alternative (--evaluate): Evaluating the coverage of the target pw list by the new pws, without generating them.
+    Every target pwline gets ranked by lookups (see rank_pw), thus the run time follows the size of the target list, not that of the new pws.
+    The covered ones are those within the candidate indexes the generation would write (--start, --count, --shard, --top).
+    Writing the candidate index and the pw of every covered target pwline to the outpwfile, printing the covered proportion and the index quantiles.
+    """
+
+    (cpattlist, prodlists)= prod_lists()
+    total= forecast(cpattlist, prodlists)[0]
+    (start, end)= index_range(total) if indexed == True else (0, total)
+    if top is not None:
+        end= min(end, start +top)
+    
+    print("")
+    print("")
+    print("Evaluating the coverage of the target list   " +evaluate +"   by the " +str(end -start) +" new pws (" +slots +" slots) ...")
+    
+    tables= rank_tables(cpattlist, prodlists)
+    progress_start("evaluate", "pws")
+    
+    # The target list gets read like an inpwfile, plain or compressed
+    codec= inpwfile_codec(evaluate)
+    if codec == "none":
+        progress_total(os.path.getsize(evaluate), inbytes=True)
+        fdrtarget= open(evaluate, "rb")
+        chunks= mmap_chunks(fdrtarget, 0, os.path.getsize(evaluate))
+    else:
+        fdrtarget= codecs[codec][0].open(evaluate, "rb")
+        chunks= block_chunks(prefetch_blocks(fdrtarget))
+    
+    fdwofl= open_outpwfile(ofl)
+    fdwcodec= compress_outfile(fdwofl) if compress != "none" else fdwofl
+    ntargets= 0
+    ranks= []
+    for chunk in chunks:
+        pws= [pw for pw in chunk.split(b"\n") if pw != b""]
+        hits= []
+        for pw in pws:
+            rank= rank_pw(pw, tables)
+            if rank is not None and start <= rank < end:
+                ranks.append(rank)
+                hits.append(b"%d\t%s\n" %(rank, pw))
+        fdwcodec.write(b"".join(hits))
+        ntargets= ntargets +len(pws)
+        progress_add(len(pws), len(chunk))
+    fdrtarget.close()
+    if fdwcodec is not fdwofl:
+        fdwcodec.close()
+    fdwofl.close()
+    
+    progress_end()
+    
+    ranks.sort()
+    coverage= len(ranks) /ntargets if ntargets > 0 else 0.0
+    print("")
+    print("")
+    print("Target pws:   " +str(ntargets))
+    print("")
+    print("Covered by the new pws:   " +str(len(ranks)) +"   (that is " +str(round(coverage *100, 2)) +" %)")
+    if ranks:
+        quantiles= [ranks[int(q *(len(ranks) -1))] -start for q in (0.0, 0.5, 0.9, 1.0)]
+        print("")
+        print("Ranks of the covered pws among the new pws (first, median, 90 %, last):")
+        print("")
+        print("    " +", ".join([str(rank) for rank in quantiles]))
+        print("")
+        print("Covered within the first n new pws:")
+        print("")
+        n= 10
+        while n < end -start:
+            print("    " +str(n) +":   " +str(round(bisect.bisect_left(ranks, start +n) /ntargets *100, 2)) +" %")
+            n= n *10
+        print("    " +str(end -start) +":   " +str(round(coverage *100, 2)) +" %")
+    
+    stagestats["evaluate"].update({"targets": ntargets, "covered": len(ranks), "coverage": round(coverage, 6), "candidates": end -start})
+    save_stats(None)
+    
+    print("")
+    print("")
+    print("Ready. The coverage of the target list has been evaluated.")
+    print("")
+    print("The <outpwfile> of the candidate indexes and the covered pws is   " +ofl + " .")   
+    print("")
+
+    
+    
+################################################################################
+
+### Library API
+
+
+def options(inpwfiles=(), outpwfile="-", **kwargs):
+
+    """
+    Returning the options namespace for configure: the defaults of the command line interface for the inpwfiles and the outpwfile, 
+    updated by kwargs, named like the option destinations of build_parser (e.g. pval_let=0.75, slots="shared", no_cache=True).
+    """
+
+    args= build_parser().parse_args(["-", "-"])
+    args.inpwfile= list(inpwfiles)
+    args.outpwfile= outpwfile
+    for name in kwargs:
+        if not hasattr(args, name):
+            raise TypeError("unknown option " +name)
+        setattr(args, name, kwargs[name])
+    
+    return args
+
+
+
+def analyze(inpwfiles, **kwargs):
+
+    """
+    Step [1] for the inpwfiles (paths, or analysis stores *.npz) with the options kwargs (see options).
+    Returning the in-memory analysis: the dict of the sorted token stores and relative cumulated frequencies by category.
+    """
+
+    configure(options(inpwfiles, **kwargs))
+    read_inpwfile()
+    
+    return tokenstats
+
+
+
+def select(stats, pval=0.5, pval_cpatt=None, pval_let=None, pval_num=None, pval_spec=None):
+
+    """
+    Steps [2a] - [2d] for the analysis stats (see analyze), without any workfiles.
+    The p-values of the categories default to pval.
+    Returning the dict of the selected substring lists by category.
+    """
+
+    pvals= {"cpatt": pval_cpatt, "let": pval_let, "num": pval_num, "spec": pval_spec}
+    prod= {}
+    for category in categories:
+        (sorted02, cumfreq03)= stats[category]
+        prod[category]= select_kernel(sorted02, cumfreq03, pval if pvals[category] is None else pvals[category])
+    
+    return prod
+
+
+
+# The options, that the lazy generation engines read while their chunks get consumed (see Generation)
+generationoptions= ("slots", "sample_mode", "seed", "dedup", "exclude_input", "dedup_memory", "dedup_fpr", "ifls")
+
+
+
+class Generation:
+
+    """
+    Iterator of the chunks of newline terminated new pws of generate, bound to the options of its generate call:
+    Every chunk gets generated with these options, whatever the later calls of the library API configure the module for.
+    """
+
+    def __init__(self, chunks):
+        self.chunks= chunks
+        self.options= {name: globals()[name] for name in generationoptions}
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        module= globals()
+        current= {name: module[name] for name in generationoptions}
+        module.update(self.options)
+        try:
+            return next(self.chunks)
+        finally:
+            module.update(current)
+
+
+
+def generate(prod, stats=None, **kwargs):
+
+    """
+    Step [3] for the selected substrings prod (see select) with the options kwargs (see options), 
+    e.g. slots, order, top, start, count, shard, sample, dedup (and inpwfiles for exclude_input).
+    order="probability" and sample_mode="weighted" take the relative frequencies of the analysis stats, that prod got selected from (see analyze).
+    Returning the iterator of the chunks of newline terminated new pws (see Generation), whose forecast is forecast(prod["cpatt"], prod) with the same slots.
+    """
+
+    configure(options(**kwargs))
+    cpattlist= prod["cpatt"]
+    prodlists= {category: prod[category] for category in ("let", "num", "spec")}
+    state= None
+    if indexed == True:
+        (start, end)= index_range(forecast(cpattlist, prodlists)[0])
+        state= {"next": start, "end": end}
+    logfreqs= None
+    if order == "probability" or (sample is not None and sample_mode == "weighted"):
+        if stats is None:
+            raise ValueError("order probability and sample_mode weighted require the analysis stats")
+        logfreqs= prod_logfreqs(cpattlist, prodlists, stats)
     
+    return Generation(pw_chunks(cpattlist, prodlists, state, logfreqs))
+
+
+
+def coverage(prod, pws, **kwargs):
+
+    """
+    Step [3] alternative (see evaluate_target) for the selected substrings prod (see select) with the options kwargs (see options), e.g. slots, utf8.
+    Returning the list of the global candidate indexes (see gen_range) of the pws (byte strings without newline), None for the ones not generated.
+    """
+
+    configure(options(**kwargs))
+    cpattlist= prod["cpatt"]
+    prodlists= {category: prod[category] for category in ("let", "num", "spec")}
+    tables= rank_tables(cpattlist, prodlists)
     
+    return [rank_pw(pw, tables) for pw in pws]
+
+
+
 ################################################################################
 
 ### Main
 
-if mode_interactive == True:
-    while True:
-        print("")
-        print("")
-        print("")
-        print("Interactive Mode")
+def run_steps():
+
+    """
+    Running the steps of the command line interface, in interactive mode by the menu, otherwise all in a row.
+    """
+
+    if mode_interactive == True:
+        while True:
+            print("")
+            print("")
+            print("")
+            print("Interactive Mode")
+            print("")
+            print("What do you want to do?")
+            print("[0]  Exit interactive mode")
+            print("[1]  Reading inpwfile and pre-processing it")
+            print("[2a] Selecting pw construction patterns by p-value")
+            print("[2b] Selecting letter substrings by p-value")
+            print("[2c] Selecting number substrings by p-value")
+            print("[2d] Selecting special character substrings by p-value")
+            print("[3]  Generate new pws")
+            if evaluate != "":
+                print("[4]  Evaluate the coverage of the target list by the new pws")
+            print("")
+            print("Each step requires (all) the result files of the previous main number steps (in the workdir).")
+            print("")
+            print("")
+            selinput= input("Your selection: ")
+
+            if selinput == "0":
+                break
+            elif selinput == "1":
+                read_inpwfile()
+            elif selinput == "2a":
+                select_cpatt()
+            elif selinput == "2b":
+                select_let()
+            elif selinput == "2c":
+                select_num()
+            elif selinput == "2d":
+                select_spec()
+            elif selinput == "3":
+                gen_pws()
+            elif selinput == "4" and evaluate != "":
+                evaluate_target()
+            else:
+                print("")
+                print("")
+                print("ERROR: Wrong input!")
+
+
+    else:
+        read_inpwfile()
+        progress_start("select", "outcomes")
+        if max_candidates is not None or max_bytes is not None:
+            solve_budget()
+        select_cpatt()
+        select_let()
+        select_num()
+        select_spec()
+        progress_add(sum(len(tokenprod[category]) for category in categories), 0)
+        progress_end()
+        if evaluate != "":
+            evaluate_target()
+        else:
+            gen_pws()
+        
+        print("Timing summary of the stages:")
         print("")
-        print("What do you want to do?")
-        print("[0]  Exit interactive mode")
-        print("[1]  Reading inpwfile and pre-processing it")
-        print("[2a] Selecting pw construction patterns by p-value")
-        print("[2b] Selecting letter substrings by p-value")
-        print("[2c] Selecting number substrings by p-value")
-        print("[2d] Selecting special character substrings by p-value")
-        print("[3]  Generate new pws")
+        for stage in stagestats:
+            print("    " +stage +":   " +str(stagestats[stage]["seconds"]) +" s")
         print("")
-        print("Each step requires (all) the result files of the previous main number steps (in the workdir).")
-        print("In step 'Generate new pws' the size forecast additionally requires the previous 4 partial steps been run fresh before.")
+
+
+
+def main(argv=None):
+
+    """
+    Command line interface: Parsing the arguments argv (by default of the command line), 
+    configuring the module and running the steps (see run_steps), exiting with the message of a ValueError of the steps.
+    """
+
+    parser= build_parser()
+    args= parser.parse_intermixed_args(argv)
+    try:
+        configure(args)
+    except ValueError as error:
+        parser.error(str(error))
+    
+    # Streaming the new pws to stdout ("-"): the printouts go to stderr
+    if ofl == "-":
+        sys.stdout= sys.stderr
+    
+    try:
+        run_steps()
+    except ValueError as error:
         print("")
         print("")
-        selinput= input("Your selection: ")
-        
-        if selinput == "0":
-            break
-        elif selinput == "1":
-            read_inpwfile() 
-        elif selinput == "2a":
-            select_cpatt()
-        elif selinput == "2b":
-            select_let()
-        elif selinput == "2c":
-            select_num()
-        elif selinput == "2d":
-            select_spec()
-        elif selinput == "3":
-            gen_pws()
-        else:
-            print("")
-            print("")
-            print("ERROR: Wrong input!")
+        print("ERROR: " +str(error))
+        sys.exit(1)
 
 
-else:
-    read_inpwfile()
-    select_cpatt()
-    select_let()
-    select_num()
-    select_spec()
-    gen_pws()
+
+if __name__ == "__main__":
+    main()
 
     
     
@@ -921,7 +3358,7 @@ else:
 
 # Further development options:
 
-# - Active support for multiple pw files
+# - Merging of the workfiles of analysis stores (*.npz inputs) in interactive mode
 
 
 
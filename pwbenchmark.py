@@ -0,0 +1,354 @@
+#! /bin/python3
+
+
+# pwbenchmark
+# By quantsareus.net
+# License: GPL-V3
+
+# Benchmark of the stages of pwanalygen.py on synthetic pw lists of fixed seeds and sizes.
+# pwanalygen.py itself stays a single file, this is a development tool next to it.
+
+
+from argparse import ArgumentParser
+import contextlib
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import numpy as np
+import pwanalygen
+
+
+################################################################################
+
+### Argument parsing and initialization
+
+
+parser= ArgumentParser()
+
+parser.add_argument("-w", "--workdir", dest="workdir", default="/tmp/pwbenchmark")
+parser.add_argument("-j", "--jobs", dest="jobs", default="1")
+parser.add_argument("--sizes", dest="sizes", default="10k,1M,10M")
+parser.add_argument("--seed", dest="seed", default="1")
+parser.add_argument("--pval", dest="pval", default="0.90")
+parser.add_argument("--slots", dest="slots", choices=("independent", "shared"), default="independent")
+parser.add_argument("--gen-count", dest="gen_count", default="10M")
+parser.add_argument("--budget", dest="budget", default="1M")
+parser.add_argument("--json", dest="json", default="-")
+
+parser.description="pwbenchmark.py times the stages of pwanalygen.py (reading the inpwfile, solving the p-values for a budget, selecting, generating) on synthetic pw lists with realistic let/num/spec/cpatt distributions, that get built at fixed seeds and sizes, and reports lines/s, candidates/s, peak RSS and bytes written as JSON. The budget solver gets checked against the exhaustive search of its p-value grid."
+
+parser.epilog="The synthetic pw lists get built once per size and seed in the workdir and re-used by later runs. The generation stage writes up to --gen-count new pws to the workdir. Runs offline, Linux (/proc) for the peak RSS of every stage."
+
+args= parser.parse_args()
+
+
+
+def parse_count(text):
+
+    """
+    Returning the number of a count text with an optional suffix k (1000) or M (1000000).
+    """
+
+    factors= {"k": 1000, "M": 1000000}
+    if text[-1:] in factors:
+        return int(float(text[:-1]) *factors[text[-1]])
+
+    return int(float(text))
+
+
+
+workdir= args.workdir
+jobs= max(int(args.jobs), 1)
+sizes= [parse_count(size) for size in args.sizes.split(",")]
+seed= int(args.seed)
+pval= float(args.pval)
+slots= args.slots
+gen_count= parse_count(args.gen_count)
+budget= parse_count(args.budget)
+ofl= args.json
+
+# The JSON goes to stdout ("-"): the printouts go to stderr
+if ofl == "-":
+    fdwjson= sys.stdout
+    sys.stdout= sys.stderr
+
+# Lines per block of the corpus builder
+corpusblock= 1000000
+
+# Condensed pw patterns of the synthetic pw lists and their relative frequencies (roughly those of large leaked pw lists)
+corpuspatterns= {"A1": 0.36, "A": 0.26, "1": 0.16, "1A": 0.04, "A1A": 0.04, "A$": 0.025, "A1$": 0.02, "A$1": 0.015,
+                 "A$A": 0.01, "1A1": 0.01, "$A": 0.005, "A1A1": 0.005, "A$A1": 0.005, "1$": 0.003, "$1": 0.002}
+# Zipf exponents of the substrings by category
+corpuszipf= {"let": 1.05, "num": 1.2, "spec": 1.5}
+
+
+
+################################################################################
+
+### Functions
+
+
+def corpus_vocab(rng):
+
+    """
+    Building the substring vocabularies of the synthetic pw lists by category, in descending order of their frequency:
+    letter words of random syllables (some capitalized), numbers (short ones, years, dates) and special symbol runs.
+    Returning the dict of the numpy byte string arrays and the dict of the cumulated Zipf frequencies by category.
+    """
+
+    consonants= b"bcdfghjklmnprstvwz"
+    vowels= b"aeiouy"
+    syllables= np.array([bytes([c, v]) for c in consonants for v in vowels], dtype=bytes)
+    # 1 - 4 syllables per word, the distinct ones in the order of their first draw
+    nsyl= rng.integers(1, 5, size=400000)
+    sylidx= rng.integers(0, syllables.shape[0], size=(400000, 4))
+    words= syllables[sylidx[:, 0]]
+    for k in range(1, 4):
+        words= np.where(nsyl > k, np.char.add(words, syllables[sylidx[:, k]]), words)
+    capital= rng.random(400000) < 0.1
+    words[capital]= np.char.capitalize(words[capital])
+    (words, first)= np.unique(words, return_index=True)
+    let= words[np.argsort(first)][:200000].tolist()
+
+    num= [str(k).encode() for k in (1, 123, 12, 2, 7, 13, 11, 3, 1234, 69, 22, 21, 5, 4, 23, 10, 6, 8, 9, 0)]
+    num+= [str(year).encode() for year in range(2024, 1949, -1)]
+    num+= [str(k).zfill(2).encode() for k in range(0, 100)]
+    num+= [str(k).encode() for k in range(100, 1000)]
+    num+= [b"%02d%02d%02d" %(day, month, year) for year in range(99, 49, -1) for month in range(1, 13) for day in range(1, 29, 3)]
+    num= list(dict.fromkeys(num))
+
+    spec= [b"!", b".", b"_", b"@", b"*", b"-", b"#", b"!!", b"$", b"?", b"&", b"+", b"/", b"!!!", b"@@", b"..", b"%", b"=", b"~", b"!@#"]
+
+    vocab= {"let": np.array(let, dtype=bytes), "num": np.array(num, dtype=bytes), "spec": np.array(spec, dtype=bytes)}
+    cumfreq= {}
+    for category in vocab:
+        weights= 1.0 /np.arange(1, vocab[category].shape[0] +1) **corpuszipf[category]
+        cumfreq[category]= np.cumsum(weights) /np.sum(weights)
+
+    return (vocab, cumfreq)
+
+
+
+def build_corpus(nlines, wfl):
+
+    """
+    Writing the synthetic pw list of nlines pws at the seed to the file wfl, in blocks of corpusblock pws:
+    Every pw gets a condensed pattern by corpuspatterns, every slot of it a substring of its category by the Zipf frequencies.
+    The same seed and size always build the same pw list.
+    """
+
+    rng= np.random.default_rng(seed)
+    (vocab, cumfreq)= corpus_vocab(rng)
+    patterns= list(corpuspatterns)
+    pattfreq= np.array([corpuspatterns[cpatt] for cpatt in patterns])
+    pattfreq= pattfreq /np.sum(pattfreq)
+    symbolcategories= {"A": "let", "1": "num", "$": "spec"}
+
+    fdw= open(wfl +".tmp", "wb")
+    done= 0
+    while done < nlines:
+        n= min(corpusblock, nlines -done)
+        pattidx= rng.choice(len(patterns), size=n, p=pattfreq)
+        pwlists= []
+        for k, cpatt in enumerate(patterns):
+            m= int(np.count_nonzero(pattidx == k))
+            if m == 0:
+                continue
+            pws= np.zeros(m, dtype="S1")
+            for symbol in cpatt:
+                category= symbolcategories[symbol]
+                tokens= vocab[category][np.searchsorted(cumfreq[category], rng.random(m), side="right").clip(0, vocab[category].shape[0] -1)]
+                pws= np.char.add(pws, tokens)
+            pwlists.append(pws)
+        pws= np.concatenate(pwlists)[rng.permutation(n)]
+        fdw.write(b"\n".join(pws.tolist()) +b"\n")
+        done= done +n
+    fdw.close()
+    os.replace(wfl +".tmp", wfl)
+
+
+
+def corpus_file(nlines):
+
+    """
+    Returning the path of the synthetic pw list of nlines pws at the seed, building it, if it does not exist yet.
+    """
+
+    wfl= workdir +"/" +"synthetic-" +str(nlines) +"-" +str(seed) +".txt"
+    if not os.path.exists(wfl):
+        print("")
+        print("Building the synthetic pw list   " +wfl +"   ...")
+        started= time.perf_counter()
+        build_corpus(nlines, wfl)
+        print("Built in " +str(round(time.perf_counter() -started, 1)) +" s.")
+
+    return wfl
+
+
+
+def reset_peak():
+
+    """
+    Resetting the peak RSS of this process (Linux /proc/self/clear_refs), thus every stage gets its own peak.
+    Returning False, if the peak cannot be reset, then the peaks are those since the start of the process.
+    """
+
+    try:
+        fdw= open("/proc/self/clear_refs", "w")
+        fdw.write("5")
+        fdw.close()
+    except OSError:
+        return False
+
+    return True
+
+
+
+def peak_rss():
+
+    """
+    Returning the peak RSS of this process in MB (Linux /proc/self/status VmHWM, otherwise getrusage).
+    """
+
+    # ru_maxrss and VmHWM are in KiB
+    peak= resource.getrusage(resource.RUSAGE_SELF).ru_maxrss *1024 /1000000
+    try:
+        fdr= open("/proc/self/status", "r")
+        for line in fdr:
+            if line.startswith("VmHWM:"):
+                peak= int(line.split()[1]) *1024 /1000000
+        fdr.close()
+    except OSError:
+        pass
+
+    return round(peak, 1)
+
+
+
+def run_stage(stage, action, workers=False):
+
+    """
+    Running the action of a stage with the printouts of pwanalygen.py muted, timing it and measuring its peak RSS.
+    With workers (the stage starts the worker processes of -j), also the largest peak RSS of the finished worker processes so far: 
+    getrusage keeps it over the lifetime of this process, it cannot be reset per stage.
+    Returning the result of the action and the dict of the stage measures.
+    """
+
+    print("Stage " +stage +" ...")
+    resettable= reset_peak()
+    started= time.perf_counter()
+    with open(os.devnull, "w") as fdwnull, contextlib.redirect_stdout(fdwnull):
+        result= action()
+    seconds= time.perf_counter() -started
+    measures= {"seconds": round(seconds, 4), "peak_rss_mb": peak_rss(), "peak_rss_reset": resettable}
+    if workers == True:
+        measures["workers_peak_rss_mb"]= round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss *1024 /1000000, 1)
+
+    return (result, measures)
+
+
+
+def budget_check():
+
+    """
+    Checking the budget solver of pwanalygen.py (the p-values of its last run) against the exhaustive search of all the steps of its p-value grid, 
+    by the same estimates. Returning the estimated covered mass of the solver and that of the exhaustive search.
+    """
+
+    model= pwanalygen.budget_model()
+    steps= model[0]
+    pvals= {"cpatt": pwanalygen.pval_cpatt, "let": pwanalygen.pval_let, "num": pwanalygen.pval_num, "spec": pwanalygen.pval_spec}
+    state= {category: int(np.searchsorted(steps[category][0], pvals[category], side="right")) -1 for category in pvals}
+    solved= float(pwanalygen.budget_estimate(model, state)[2])
+    
+    best= 0.0
+    for cpattstep in range(0, steps["cpatt"][0].shape[0]):
+        grid= {"cpatt": cpattstep, "let": np.arange(0, steps["let"][0].shape[0])[:, None, None], 
+               "num": np.arange(0, steps["num"][0].shape[0])[None, :, None], "spec": np.arange(0, steps["spec"][0].shape[0])[None, None, :]}
+        (counts, nbytes, masses)= pwanalygen.budget_estimate(model, grid)
+        best= max(best, float(np.max(np.where(counts <= budget, masses, 0.0))))
+    
+    return (solved, best)
+
+
+
+def bench_size(nlines):
+
+    """
+    Benchmarking the stages of pwanalygen.py on the synthetic pw list of nlines pws.
+    Returning the dict of the run with the measures of every stage.
+    """
+
+    wfl= corpus_file(nlines)
+    print("")
+    print("Benchmarking " +str(nlines) +" pws ...")
+    run= {"lines": nlines, "corpus": wfl, "corpus_bytes": os.path.getsize(wfl), "stages": {}}
+
+    # Step [1], without the analysis cache
+    (stats, measures)= run_stage("read_inpwfile", lambda: pwanalygen.analyze([wfl], workdir=workdir, jobs=jobs, no_cache=True, max_candidates=budget), jobs > 1)
+    measures["lines_per_s"]= round(nlines /measures["seconds"])
+    run["stages"]["read_inpwfile"]= measures
+    
+    # Budget solver of the analysis of step [1], up to budget new pws
+    (result, measures)= run_stage("solve_budget", pwanalygen.solve_budget)
+    (measures["mass"], measures["grid_mass"])= budget_check()
+    measures["gap"]= round(measures["grid_mass"] -measures["mass"], 6)
+    run["stages"]["solve_budget"]= measures
+
+    # Steps [2a] - [2d]
+    (prod, measures)= run_stage("select", lambda: pwanalygen.select(stats, pval))
+    measures["outcomes"]= {category: len(prod[category]) for category in prod}
+    run["stages"]["select"]= measures
+
+    # Step [3], up to gen_count new pws, written to the workdir
+    wflgen= workdir +"/" +"pwsgenerated.txt"
+
+    def generate():
+        chunks= pwanalygen.generate(prod, workdir=workdir, slots=slots, top=gen_count)
+        (forecast, forecastbytes)= pwanalygen.forecast(prod["cpatt"], prod)
+        nbytes= 0
+        fdw= open(wflgen, "wb")
+        for chunk in chunks:
+            fdw.write(chunk)
+            nbytes= nbytes +len(chunk)
+        fdw.close()
+        return (min(forecast, gen_count), nbytes)
+
+    ((candidates, nbytes), measures)= run_stage("gen_pws", generate)
+    os.remove(wflgen)
+    measures["candidates"]= candidates
+    measures["candidates_per_s"]= round(candidates /measures["seconds"])
+    measures["bytes_written"]= nbytes
+    run["stages"]["gen_pws"]= measures
+
+    return run
+
+
+
+################################################################################
+
+### Main
+
+os.makedirs(workdir, exist_ok=True)
+
+report= {"tool": "pwanalygen", "version": pwanalygen.version, "python": platform.python_version(), "numpy": np.__version__,
+         "machine": platform.machine(), "system": platform.platform(), "cpus": os.cpu_count(),
+         "options": {"seed": seed, "jobs": jobs, "pval": pval, "slots": slots, "gen_count": gen_count, "budget": budget}, "runs": []}
+for nlines in sizes:
+    report["runs"].append(bench_size(nlines))
+    for stage in report["runs"][-1]["stages"]:
+        print("    " +stage +":   " +json.dumps(report["runs"][-1]["stages"][stage]))
+
+if ofl == "-":
+    json.dump(report, fdwjson, indent=2)
+    fdwjson.write("\n")
+else:
+    fdw= open(ofl, "w")
+    json.dump(report, fdw, indent=2)
+    fdw.write("\n")
+    fdw.close()
+    print("")
+    print("The benchmark report is   " +ofl +" .")